@@ -2,7 +2,6 @@ import os
 from pyomyo import Myo, emg_mode
 import time
 import pandas as pd
-from datetime import datetime
 from ArMyo_Pyomyo.src.pyomyo.pyomyo import cls
 
 class Listener:
@@ -20,8 +19,8 @@ class Listener:
         }
 
     def proc_imu(self, quat, acc, gyro):
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
-        self.data['Timestamp'].append(timestamp)
+        # Sampling time in monotonic nanoseconds, converted once when saving
+        self.data['Timestamp'].append(self.myo.imu_time)
         self.data['Quat_w'].append(quat[0])
         self.data['Quat_x'].append(quat[1])
         self.data['Quat_y'].append(quat[2])
@@ -41,6 +40,8 @@ class Listener:
 
     def save_data(self):
         df = pd.DataFrame(self.data)
+        # Seconds since the first sample
+        df['Timestamp'] = (df['Timestamp'] - df['Timestamp'].iloc[0]) / 1e9
         df.to_excel('imu_data.xlsx', index=False)
         print("Datos guardados en imu_data.xlsx")
 
@@ -1,14 +1,11 @@
 import os
-from pyomyo import Myo, emg_mode
-import time
+from pyomyo import Myo, MyoStream, emg_mode
 import csv
-from ArMyo_Pyomyo.src.pyomyo.pyomyo import cls
 
 class Listener:
     def __init__(self):
         self.myo = Myo(mode=emg_mode.PREPROCESSED)
         self.myo.connect()
-        self.myo.add_imu_handler(self.proc_imu)
         self.myo.add_battery_handler(self.proc_battery)
 
         # Crear o abrir archivo CSV
@@ -16,29 +13,34 @@ class Listener:
         self.csv_writer = csv.writer(self.csv_file)
         self.csv_writer.writerow(['Timestamp', 'Quat_w', 'Quat_x', 'Quat_y', 'Quat_z', 
                                   'Acc_x', 'Acc_y', 'Acc_z', 'Gyro_x', 'Gyro_y', 'Gyro_z'])
-        self.timestamp = 0.0
+        self.start_time = None
 
-    def proc_imu(self, quat, acc, gyro):
+    def proc_imu(self, t, quat, acc, gyro):
+        if self.start_time is None:
+            self.start_time = t
+        timestamp = (t - self.start_time) / 1e9
         quat_w, quat_x, quat_y, quat_z = quat
         acc_x, acc_y, acc_z = acc
         gyro_x, gyro_y, gyro_z = gyro
         
         # Escribir datos en el archivo CSV
-        self.csv_writer.writerow([self.timestamp, quat_w, quat_x, quat_y, quat_z, 
+        self.csv_writer.writerow([timestamp, quat_w, quat_x, quat_y, quat_z, 
                                   acc_x, acc_y, acc_z, gyro_x, gyro_y, gyro_z])
-        self.timestamp += 0.01
 
     def proc_battery(self, battery_level):
         print(f"Nivel de batería: {battery_level}")
 
     def run(self):
+        # The stream thread keeps draining the port while we write the CSV
+        stream = MyoStream(self.myo)
         try:
-            while True:
-                cls()
-                self.myo.run()
-                time.sleep(0.01)
+            with stream:
+                for kind, t, values in stream:
+                    if kind == 'imu':
+                        self.proc_imu(t, *values)
         except KeyboardInterrupt:
             print("Desconectando...")
+            print(f"Muestras descartadas: {stream.dropped}")
             self.myo.disconnect()
             self.csv_file.close()
 
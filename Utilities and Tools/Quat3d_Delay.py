@@ -1,12 +1,13 @@
+import collections
 import multiprocessing
 import queue
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import animation
 from mpl_toolkits.mplot3d import Axes3D
-from scipy.signal import butter, filtfilt
 from scipy.spatial.transform import Rotation as R
 from pyomyo import Myo, emg_mode
+from pyomyo.filters import FilterBank
 import time
 import os
 
@@ -55,13 +56,9 @@ quat_z_annotation = ax_imu.text2D(0.05, 0.80, '', transform=ax_imu.transAxes, fo
 
 imu_queue = queue.Queue(QUEUE_SIZE)
 
-# Butterworth filter function
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    nyquist = 0.5 * fs
-    normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    y = filtfilt(b, a, data, axis=0)
-    return y
+# Streaming Butterworth filter, each sample is filtered once as it arrives
+fs = 100  # Sample rate
+quat_filter = FilterBank(3, fs, [('lowpass', 2, 5)])
 
 def normalize_quaternions(data):
     norms = np.linalg.norm(data[:, 1:], axis=1, keepdims=True)
@@ -78,25 +75,20 @@ def duplicate_quaternions(data):
     duplicated_data = np.vstack((data, -data))
     return duplicated_data
 
-quats = []
+# Quaternions, w and the filtered x, y, z
+quats = collections.deque(maxlen=QUEUE_SIZE)
 
 def animate(i):
     while not q.empty():
         quat, acc, gyro = q.get()
         if quat is not None and acc is not None and gyro is not None:
-            if len(quats) >= QUEUE_SIZE:
-                quats.pop(0)
-            quats.append(quat)
+            # Apply lowpass filter to the quaternion data
+            quats.append(np.concatenate(([quat[0]], quat_filter.update(quat[1:]))))
 
-    if len(quats) >= 20:  # Ensure there are enough points for the filter
-        quat_data = np.array(quats)
-
-        # Apply lowpass filter to the quaternion data
-        fs = 100  # Sample rate
-        quat_data_filtered = butter_lowpass_filter(quat_data[:, 1:], 2, fs)
+    if len(quats) >= 20:  # Ensure there are enough points to plot
+        quat_data_filtered = np.array(quats)
 
         # Normalize the filtered quaternion data
-        quat_data_filtered = np.hstack((quat_data[:, [0]], quat_data_filtered))
         quat_data_normalized = normalize_quaternions(quat_data_filtered)
 
         # Define the rotation quaternion for alignment
@@ -110,7 +102,7 @@ def animate(i):
         quat_data_final = duplicate_quaternions(quat_data_normalized_rotated)
 
         # Update annotations for quat_w, quat_x, quat_y, quat_z
-        quat_w_annotation.set_text(f'Quat_w: {quat_data[-1, 0]:.2f}')
+        quat_w_annotation.set_text(f'Quat_w: {quat_data_filtered[-1, 0]:.2f}')
         quat_x_annotation.set_text(f'Quat_x: {quat_data_final[-1, 1]:.2f}')
         quat_y_annotation.set_text(f'Quat_y: {quat_data_final[-1, 2]:.2f}')
         quat_z_annotation.set_text(f'Quat_z: {quat_data_final[-1, 3]:.2f}')
@@ -1,15 +1,17 @@
+import collections
 import multiprocessing
 import queue
 import numpy as np
 import os
-from scipy.signal import butter, filtfilt
 from pyomyo import Myo, emg_mode
+from pyomyo.filters import FilterBank
 
 print("Press ctrl+pause/break to stop")
 
 # ------------ Myo Setup ---------------
 q = multiprocessing.Queue()
-data_buffer = []
+# The last 20 filtered quaternions
+data_buffer = collections.deque(maxlen=20)
 normalized_buffer = None
 
 def worker(q):
@@ -34,13 +36,9 @@ def worker(q):
             print("Worker Stopped")
             quit()
 
-# Butterworth filter function
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    nyquist = 0.5 * fs
-    normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    y = filtfilt(b, a, data, axis=0)
-    return y
+# Streaming Butterworth filter, each sample is filtered once as it arrives
+fs = 100  # Sample rate
+quat_filter = FilterBank(4, fs, [('lowpass', 2, 5)])
 
 def normalize(data, prev_normalized, tolerance=0.01):
     mean = np.mean(data, axis=0)
@@ -79,14 +77,11 @@ def process_data():
         if not q.empty():
             quat, acc, gyro = q.get()
             if quat is not None and acc is not None and gyro is not None:
-                data_buffer.append(quat)
-                
-                if len(data_buffer) >= 20:  # Ensure we have enough data for the filter
-                    quat_data = np.array(data_buffer[-20:])
-
-                    # Apply lowpass filter to the quaternion data
-                    fs = 100  # Sample rate
-                    quat_data_filtered = butter_lowpass_filter(quat_data, 2, fs)
+                # Apply lowpass filter to the quaternion data
+                data_buffer.append(quat_filter.update(quat))
+
+                if len(data_buffer) >= 20:  # Ensure we have a full window to normalize
+                    quat_data_filtered = np.array(data_buffer)
 
                     # Normalize the filtered quaternion data
                     quat_data_normalized = normalize(quat_data_filtered, normalized_buffer)
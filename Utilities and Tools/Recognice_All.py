@@ -11,7 +11,7 @@ class Listener:
         self.myo.add_imu_handler(self.proc_imu)
         self.myo.add_battery_handler(self.proc_battery)
         self.data = []
-        self.start_time = time.time()
+        self.start_time = time.monotonic_ns()
         
         # Video capture setup
         self.cap = cv2.VideoCapture(0)
@@ -19,7 +19,7 @@ class Listener:
                                    cv2.VideoWriter_fourcc(*'XVID'), 20.0, (640, 480))
 
     def proc_imu(self, quat, acc, gyro):
-        timestamp = time.time() - self.start_time
+        timestamp = (self.myo.imu_time - self.start_time) / 1e9
         self.data.append([timestamp, quat, acc, gyro])
         print(f"Timestamp: {timestamp:.2f}, Cuaternión: {quat}, Acelerómetro: {acc}, Giroscopio: {gyro}")
 
@@ -76,6 +76,8 @@ if __name__ == '__main__':
 		pass
 	finally:
 		m.disconnect()
+		# Cuts the training files back to their samples
+		m.cls.close()
 		print()
 		#client_socket.close()
 		pygame.quit()
\ No newline at end of file
@@ -1,29 +1,37 @@
-import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 
+from pyomyo.legacy import load
+
 # Cambia las rutas a las rutas locales donde tienes los archivos
-data_quieto = pd.read_csv('myo_data_exp_quieto.txt', delimiter='\t')
-data_movil = pd.read_csv('Myo_data_exp_movil.txt', delimiter='\t')
+# La primera vez se convierten a .myo, luego se abren sin volver a leer el texto
+def load_imu(path):
+    times, imu = load(path).read('imu')
+    return (times - times[0]) / 1e9, imu.astype(np.float64)
+
+data_quieto = load_imu('myo_data_exp_quieto.txt')
+data_movil = load_imu('Myo_data_exp_movil.txt')
 
 # Visualización de datos
 def plot_data(data, title):
+    timestamp, imu = data
     plt.figure(figsize=(15, 10))
     plt.suptitle(title)
     
     plt.subplot(3, 1, 1)
-    plt.plot(data['Timestamp'], data[['Acc_x', 'Acc_y', 'Acc_z']])
+    plt.plot(timestamp, imu[:, 4:7])
     plt.title('Aceleración')
     plt.xlabel('Timestamp')
     plt.ylabel('Aceleración')
     
     plt.subplot(3, 1, 2)
-    plt.plot(data['Timestamp'], data[['Gyro_x', 'Gyro_y', 'Gyro_z']])
+    plt.plot(timestamp, imu[:, 7:10])
     plt.title('Giroscopio')
     plt.xlabel('Timestamp')
     plt.ylabel('Giroscopio')
     
     plt.subplot(3, 1, 3)
-    plt.plot(data['Timestamp'], data[['Quat_w', 'Quat_x', 'Quat_y', 'Quat_z']])
+    plt.plot(timestamp, imu[:, 0:4])
     plt.title('Cuaterniones')
     plt.xlabel('Timestamp')
     plt.ylabel('Cuaterniones')
@@ -35,8 +43,15 @@ plot_data(data_quieto, 'Datos en Reposo')
 plot_data(data_movil, 'Datos en Movimiento')
 
 # Filtrado de datos (ejemplo simple usando media móvil)
-data_quieto_filtered = data_quieto.rolling(window=5).mean()
-data_movil_filtered = data_movil.rolling(window=5).mean()
+def rolling_mean(data, window=5):
+    timestamp, imu = data
+    c = np.cumsum(np.vstack([np.zeros((1, imu.shape[1])), imu]), axis=0)
+    filtered = np.full(imu.shape, np.nan)
+    filtered[window - 1:] = (c[window:] - c[:-window]) / window
+    return timestamp, filtered
+
+data_quieto_filtered = rolling_mean(data_quieto)
+data_movil_filtered = rolling_mean(data_movil)
 
 plot_data(data_quieto_filtered, 'Datos en Reposo (Filtrados)')
 plot_data(data_movil_filtered, 'Datos en Movimiento (Filtrados)')
@@ -0,0 +1,52 @@
+# Capture and replay
+# python capture_replay.py record session.cap [seconds]
+#   records a session with the Myo to session.cap
+# python capture_replay.py replay session.cap [speed]
+#   replays it, speed 0 replays as fast as possible, and reports throughput
+import sys
+import time
+
+from pyomyo import Myo, emg_mode
+from pyomyo.pyomyo import BT, detect_ttys
+from pyomyo.transport import RecordingTransport, ReplayTransport
+
+MODE = emg_mode.FILTERED
+
+def record(path, seconds):
+	ttys = detect_ttys()
+	if not ttys:
+		raise ValueError('Myo dongle not found!')
+	transport = RecordingTransport(path, ttys[0])
+	m = Myo(mode=MODE, bt=BT(transport=transport))
+	m.connect()
+	end = time.monotonic() + seconds
+	while time.monotonic() < end:
+		m.run()
+	m.disconnect()
+	transport.close()
+
+def replay(path, speed):
+	m = Myo(mode=MODE, bt=BT(transport=ReplayTransport(path, speed or None)))
+	counts = {'emg': 0, 'imu': 0}
+	m.connect()
+	m.add_emg_handler(lambda emg, moving: counts.__setitem__('emg', counts['emg'] + 1))
+	m.add_imu_handler(lambda quat, acc, gyro: counts.__setitem__('imu', counts['imu'] + 1))
+
+	start = time.perf_counter()
+	try:
+		while True:
+			m.run()
+	except EOFError:
+		pass
+	t = time.perf_counter() - start
+	print(f"{counts['emg']} EMG and {counts['imu']} IMU samples in {t:.3f} s")
+	print(f"{(counts['emg'] + counts['imu']) / t:.0f} samples/s, {m.bt.framer.skipped} bytes skipped")
+
+if __name__ == '__main__':
+	if len(sys.argv) < 3 or sys.argv[1] not in ('record', 'replay'):
+		print("usage: capture_replay.py record|replay file [seconds|speed]")
+		sys.exit(1)
+	if sys.argv[1] == 'record':
+		record(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 10)
+	else:
+		replay(sys.argv[2], float(sys.argv[3]) if len(sys.argv) > 3 else 1.0)
@@ -1,10 +1,9 @@
 # Simplistic data recording
 import time
 import multiprocessing
-import numpy as np
-import pandas as pd
 
 from pyomyo import Myo, emg_mode
+from pyomyo.recording import Recorder, Recording
 
 def data_worker(mode, seconds, filepath):
 	collect = True
@@ -13,12 +12,8 @@ def data_worker(mode, seconds, filepath):
 	m = Myo(mode=mode)
 	m.connect()
 
-	myo_data = []
-
-	def add_to_queue(emg, movement):
-		myo_data.append(emg)
-
-	m.add_emg_handler(add_to_queue)
+	# Samples go to disk as they come, memory use does not grow with the session
+	recorder = Recorder(filepath, m)
 
 	def print_battery(bat):
 		print("Battery level:", bat)
@@ -40,20 +35,16 @@ def data_worker(mode, seconds, filepath):
 		else:
 			collect = False
 			collection_time = time.time() - start_time
+			recorder.close()
 			print("Finished collecting.")
 			print(f"Collection time: {collection_time}")
-			print(len(myo_data), "frames collected")
-
-			# Add columns and save to df
-			myo_cols = ["Channel_1", "Channel_2", "Channel_3", "Channel_4", "Channel_5", "Channel_6", "Channel_7", "Channel_8"]
-			myo_df = pd.DataFrame(myo_data, columns=myo_cols)
-			myo_df.to_csv(filepath, index=False)
-			print("CSV Saved at: ", filepath)
+			print(Recording(filepath).count('emg'), "frames collected")
+			print("Recording saved at: ", filepath)
 
 # -------- Main Program Loop -----------
 if __name__ == '__main__':
 	seconds = 10
-	file_name = str(seconds)+"_test_emg.csv"
+	file_name = str(seconds)+"_test_emg.myo"
 	mode = emg_mode.PREPROCESSED
 	p = multiprocessing.Process(target=data_worker, args=(mode, seconds, file_name))
 	p.start()
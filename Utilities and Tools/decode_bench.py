@@ -0,0 +1,83 @@
+# Decode benchmark
+# Compares the old if/elif chain in handle_data against the
+# struct.Struct dispatch table, no Myo or dongle needed.
+import struct
+import time
+
+import pyomyo.pyomyo as pyomyo
+from pyomyo import Myo, Packet, Arm, XDirection, Pose, unpack
+
+N_PACKETS = 200000
+
+def make_packet(attr, data):
+	payload = struct.pack('<BHBB', 0, attr, 1, len(data)) + data
+	return Packet(bytes([0x80, len(payload), 4, 5]) + payload, time.monotonic_ns())
+
+def chain_handle_data(m, p):
+	'''
+	The if/elif chain handle_data used before the dispatch table, with the
+	same sample timestamping the table path does.
+	'''
+	if (p.cls, p.cmd) != (4, 5):
+		return
+
+	c, attr, typ = unpack('BHB', p.payload[:4])
+	pay = p.payload[5:]
+	if attr == 0x27:
+		vals = unpack('8HB', pay)
+		m.emg_index, m.emg_time = m.emg_clock.update(p.t)
+		m.on_emg(vals[:8], vals[8])
+	elif attr == 0x2b or attr == 0x2e or attr == 0x31 or attr == 0x34:
+		emg1 = struct.unpack('<8b', pay[:8])
+		emg2 = struct.unpack('<8b', pay[8:])
+		m.emg_index, m.emg_time = m.emg_clock.update(p.t, 2)
+		m.on_emg(emg1, 0)
+		m.on_emg(emg2, 0)
+	elif attr == 0x1c:
+		vals = unpack('10h', pay)
+		m.imu_index, m.imu_time = m.imu_clock.update(p.t)
+		m.on_imu(vals[:4], vals[4:7], vals[7:10])
+	elif attr == 0x23:
+		typ, val, xdir, _, _, _ = unpack('6B', pay)
+		if typ == 1:
+			m.on_arm(Arm(val), XDirection(xdir))
+		elif typ == 2:
+			m.on_arm(Arm.UNKNOWN, XDirection.UNKNOWN)
+		elif typ == 3:
+			m.on_pose(Pose(val))
+	elif attr == 0x11:
+		m.on_battery(pay[0])
+
+def bench(name, handle, packets):
+	start = time.perf_counter()
+	for p in packets:
+		handle(p)
+	t = time.perf_counter() - start
+	print(f"{name}: {len(packets)} packets in {t:.3f} s, {1e6 * t / len(packets):.2f} us/packet")
+	return t
+
+if __name__ == '__main__':
+	# Only the decoding is measured, so don't open a serial port
+	pyomyo.BT = lambda tty: None
+	m = Myo(tty='bench')
+	m.add_emg_handler(lambda emg, moving: None)
+	m.add_imu_handler(lambda quat, acc, gyro: None)
+	m.add_pose_handler(lambda p: None)
+	m.add_battery_handler(lambda b: None)
+
+	# Roughly what the armband sends in raw mode: 4 EMG notifications per IMU one
+	stream = [
+		make_packet(0x2b, bytes(range(16))),
+		make_packet(0x2e, bytes(range(16))),
+		make_packet(0x31, bytes(range(16))),
+		make_packet(0x34, bytes(range(16))),
+		make_packet(0x1c, struct.pack('<10h', *range(10))),
+		make_packet(0x27, struct.pack('<8HB', *range(9))),
+		make_packet(0x23, struct.pack('<6B', 3, 1, 0, 0, 0, 0)),
+		make_packet(0x11, b'\x64'),
+	]
+	packets = stream * (N_PACKETS // len(stream))
+
+	old = bench("if/elif chain", lambda p: chain_handle_data(m, p), packets)
+	new = bench("dispatch table", m.handle_data, packets)
+	print(f"Speedup: {old / new:.2f}x")
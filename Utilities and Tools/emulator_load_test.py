@@ -0,0 +1,71 @@
+# Emulator load test, Linux/macOS only
+# Connects the real Myo code to an emulated dongle and reports connect time,
+# sustained throughput and how it copes with injected faults.
+# python emulator_load_test.py [myos] [seconds]
+import sys
+import time
+
+from pyomyo import Myo, MyoHub, MyoStream, emg_mode
+from pyomyo.emulator import DongleEmulator
+
+MODE = emg_mode.RAW
+FAULTS = {
+	'clean': {},
+	'jitter': {'jitter': 0.02},
+	'lossy': {'drop': 0.02, 'garbage': 0.005},
+	'stalls': {'overrun': 0.002, 'stall': 0.2},
+}
+
+def run(n_myos, seconds, faults):
+	with DongleEmulator(myos=n_myos, seed=0, **faults) as e:
+		hub = MyoHub(e.port)
+		start = time.perf_counter()
+		myos = [hub.add_myo(mode=MODE) for _ in range(n_myos)]
+		connect = time.perf_counter() - start
+
+		counts = [0] * n_myos
+		for i, m in enumerate(myos):
+			m.add_emg_handler(lambda emg, moving, i=i: counts.__setitem__(i, counts[i] + 1))
+			m.add_imu_handler(lambda quat, acc, gyro, i=i: counts.__setitem__(i, counts[i] + 1))
+
+		start = time.perf_counter()
+		end = start + seconds
+		while time.perf_counter() < end:
+			hub.run()
+		t = time.perf_counter() - start
+
+		stats = e.stats()
+		lost = sum(m.emg_clock.lost + m.imu_clock.lost for m in myos)
+		print(f"  connect {connect * 1000:.1f} ms, {sum(counts) / t:.0f} samples/s, "
+			f"{lost} samples lost, {hub.bt.framer.skipped} bytes skipped")
+		print(f"  emulator: dropped {stats['dropped']}, stalls {stats['stalls']}, "
+			f"garbage {stats['garbage']}, overflowed {stats['overflowed']}")
+
+def command_check(seconds):
+	'''Sends commands while streaming, each sample must be handled only once.'''
+	with DongleEmulator(seed=0) as e:
+		m = Myo(e.port, mode=emg_mode.PREPROCESSED)
+		m.connect()
+		received = 0
+		with MyoStream(m) as stream:
+			end = time.perf_counter() + seconds
+			next_command = time.perf_counter()
+			while time.perf_counter() < end:
+				if time.perf_counter() >= next_command:
+					m.vibrate(1)
+					next_command += 0.25
+				received += sum(kind == 'emg' for kind, t, values in stream.get_all())
+				time.sleep(0.01)
+		received += sum(kind == 'emg' for kind, t, values in stream.get_all())
+		sent = e.stats()['myos'][0]['sent']['emg']
+		print(f"  {received} EMG samples handled for {sent} sent")
+		assert sent - 5 <= received <= sent, 'samples handled more than once or missing'
+
+if __name__ == '__main__':
+	n_myos = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+	seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+	for name, faults in FAULTS.items():
+		print(name)
+		run(n_myos, seconds, faults)
+	print('commands while streaming')
+	command_check(seconds)
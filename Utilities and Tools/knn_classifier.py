@@ -41,24 +41,32 @@ class KNN_Classifier(Classifier):
 	'''Live implimentation of SkLearns KNN'''
 
 	def __init__(self):
-		Classifier.__init__(self)
+		# The kd-tree is rebuilt in the background, see Trainer
+		Classifier.__init__(self, background=True)
 
-	def train(self, X, Y):
-		self.X = X
-		self.Y = Y
-		self.model = None
-		if self.X.shape[0] >= K * SUBSAMPLE:
-			self.model = neighbors.KNeighborsClassifier(n_neighbors=K, algorithm='kd_tree')
-			self.model.fit(self.X[::SUBSAMPLE], self.Y[::SUBSAMPLE])
+	def fit(self, X, Y):
+		if X.shape[0] < K * SUBSAMPLE:
+			return None
+		model = neighbors.KNeighborsClassifier(n_neighbors=K, algorithm='kd_tree')
+		model.fit(X[::SUBSAMPLE], Y[::SUBSAMPLE])
+		return model
 
 	def classify(self, emg):
 		x = np.array(emg).reshape(1,-1)
-		if self.X.shape[0] < K * SUBSAMPLE: 
+		model = self.model
+		if self.X.shape[0] < K * SUBSAMPLE or model is None: 
 			return 0
 
-		pred = self.model.predict(x)
+		pred = model.predict(x)
 		return int(pred[0])
 
+	def classify_batch(self, block):
+		model = self.model
+		if self.X.shape[0] < K * SUBSAMPLE or model is None:
+			return np.zeros(len(block), np.int64)
+
+		return np.asarray(model.predict(np.asarray(block)), np.int64)
+
 def text(scr, font, txt, pos, clr=(255,255,255)):
 	scr.blit(font.render(txt, True, clr), pos)
 
@@ -79,7 +87,7 @@ if __name__ == '__main__':
 		while True:
 			m.run()
 
-			r = m.history_cnt.most_common(1)[0][0]
+			r = m.smoother.mode
 
 			# Handle keypresses
 			for ev in pygame.event.get():
@@ -91,7 +99,7 @@ if __name__ == '__main__':
 					elif K_KP0 <= ev.key <= K_KP9:
 						hnd.recording = ev.key - K_Kp0
 					elif ev.unicode == 'r':
-						hnd.cl.read_data()
+						m.cls.read_data()
 					elif ev.unicode == 'e':
 						print("Pressed e, erasing local data")
 						m.cls.delete_data()
@@ -108,20 +116,21 @@ if __name__ == '__main__':
 
 				clr = (0,200,0) if i == r else (255,255,255)
 
-				txt = font.render('%5d' % (m.cls.Y == i).sum(), True, (255,255,255))
+				txt = font.render('%5d' % m.cls.count(i), True, (255,255,255))
 				scr.blit(txt, (x + 20, y))
 
 				txt = font.render('%d' % i, True, clr)
 				scr.blit(txt, (x + 110, y))
 
 				# Plot the history of predicitons
-				scr.fill((0,0,0), (x+130, y + txt.get_height() / 2 - 10, len(m.history) * 20, 20))
-				scr.fill(clr, (x+130, y + txt.get_height() / 2 - 10, m.history_cnt[i] * 20, 20))
+				scr.fill((0,0,0), (x+130, y + txt.get_height() / 2 - 10, m.smoother.length * 20, 20))
+				scr.fill(clr, (x+130, y + txt.get_height() / 2 - 10, m.smoother.counts[i] * 20, 20))
 
-				if m.cls.model is not None:
+				model = m.cls.model
+				if model is not None:
 					print("emg", hnd.emg)
 					x = np.array(hnd.emg).reshape(1,-1)
-					dists, inds = m.cls.model.kneighbors(x)
+					dists, inds = model.kneighbors(x)
 					for i, (d, ind) in enumerate(zip(dists[0], inds[0])):
 						y = m.cls.Y[SUBSAMPLE*ind]
 						print("y", y)
@@ -134,5 +143,7 @@ if __name__ == '__main__':
 		pass
 	finally:
 		m.disconnect()
+		# Cuts the training files back to their samples
+		m.cls.close()
 		print()
 		pygame.quit()
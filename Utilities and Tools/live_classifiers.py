@@ -25,28 +25,18 @@ class SVM_Classifier(Live_Classifier):
 	def __init__(self):
 		Live_Classifier.__init__(self, None, "SVM", (100,0,100))
 
-	def train(self, X, Y):
-		self.X = X
-		self.Y = Y
+	def fit(self, X, Y):
 		try:
-			if self.X.shape[0] > 0: 
+			if X.shape[0] > 0: 
 				clf = make_pipeline(StandardScaler(), SVC(gamma='auto'))
 				#clf = make_pipeline(StandardScaler(), SVC(kernel="linear", C=0.025))
 
-				clf.fit(self.X, self.Y)
-				self.model = clf
+				clf.fit(X, Y)
+				return clf
 		except:
 			# SVM Errors when we only have data for 1 class.
-			self.model = None
-
-	def classify(self, emg):
-		if self.X.shape[0] == 0 or self.model == None:
-			# We have no data or model, return 0
-			return 0
-
-		x = np.array(emg).reshape(1,-1)
-		pred = self.model.predict(x)
-		return int(pred[0])
+			pass
+		return None
 
 
 class DC_Classifier(Live_Classifier):
@@ -70,25 +60,16 @@ class LR_Classifier(Live_Classifier):
 	def __init__(self):
 		Live_Classifier.__init__(self, None, name="LR", color=(100,0,100))
 
-	def train(self, X, Y):
-		self.X = X
-		self.Y = Y
+	def fit(self, X, Y):
 		try:
-			if self.X.shape[0] > 0: 
-				self.model = LogisticRegression()
-				self.model.fit(self.X, self.Y)
+			if X.shape[0] > 0: 
+				model = LogisticRegression()
+				model.fit(X, Y)
+				return model
 		except:
 			# LR Errors when we only have data for 1 class.
-			self.model = None
-
-	def classify(self, emg):
-		if self.X.shape[0] == 0 or self.model == None:
-			# We have no data or model, return 0
-			return 0
-
-		x = np.array(emg).reshape(1,-1)
-		pred = self.model.predict(x)
-		return int(pred[0])
+			pass
+		return None
 
 
 if __name__ == '__main__':
@@ -126,5 +107,7 @@ if __name__ == '__main__':
 		pass
 	finally:
 		m.disconnect()
+		# Cuts the training files back to their samples
+		m.cls.close()
 		print()
 		pygame.quit()
@@ -1,18 +1,17 @@
 import multiprocessing
 from pyomyo import Myo, emg_mode
+from pyomyo.ring import MyoRings
 
-# ------------ Myo Setup ---------------
-q = multiprocessing.Queue()
+MODE = emg_mode.FILTERED
 
-def worker(q):
-	m = Myo(mode=emg_mode.FILTERED)
+# ------------ Myo Setup ---------------
+def worker(rings):
+	m = Myo(mode=MODE)
 	m.connect()
-	
-	def add_to_queue(emg, movement):
-		q.put(emg)
 
-	m.add_emg_handler(add_to_queue)
-	
+	# Write EMG and IMU data into shared memory instead of a queue
+	rings.attach(m)
+
 	def print_battery(bat):
 		print("Battery level:", bat)
 
@@ -22,7 +21,7 @@ def worker(q):
 	m.set_leds([128, 0, 0], [128, 0, 0])
 	# Vibrate to know we connected okay
 	m.vibrate(1)
-	
+
 	"""worker function"""
 	while True:
 		m.run()
@@ -30,15 +29,21 @@ def worker(q):
 
 # -------- Main Program Loop -----------
 if __name__ == "__main__":
-	p = multiprocessing.Process(target=worker, args=(q,))
+	rings = MyoRings(mode=MODE)
+	p = multiprocessing.Process(target=worker, args=(rings,))
 	p.start()
 
+	seq = 0
 	try:
 		while True:
-			while not(q.empty()):
-				emg = list(q.get())
+			# Sleep until the worker writes new samples
+			rings.emg.wait(seq)
+			times, emgs, seq = rings.emg.read(seq)
+			for emg in emgs.tolist():
 				print(emg)
 
 	except KeyboardInterrupt:
 		print("Quitting")
-		quit()
\ No newline at end of file
+		p.terminate()
+		rings.close()
+		quit()
@@ -3,8 +3,8 @@ import queue
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import animation
-from scipy.signal import butter, filtfilt
 from pyomyo import Myo, emg_mode
+from pyomyo.filters import FilterBank
 
 print("Press ctrl+pause/break to stop")
 
@@ -87,13 +87,13 @@ quat_z_annotation = subplots_imu[2].text(0.6, 0.8, '', transform=subplots_imu[2]
 emg_queue = queue.Queue(QUEUE_SIZE)
 imu_queue = queue.Queue(QUEUE_SIZE)
 
-# Butterworth filter function
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    nyquist = 0.5 * fs
-    normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    y = filtfilt(b, a, data, axis=0)
-    return y
+# Streaming Butterworth filters, each sample is filtered once as it arrives
+EMG_FS = 200  # Sample rate
+IMU_FS = 100
+emg_filter = FilterBank(SENSORS_EMG, EMG_FS, [('lowpass', 5, 5)])
+acc_filter = FilterBank(3, IMU_FS, [('lowpass', 2, 5)])
+gyro_filter = FilterBank(3, IMU_FS, [('lowpass', 2, 5)])
+quat_filter = FilterBank(3, IMU_FS, [('lowpass', 2, 5)])
 
 def filter_emg_noise(emg_data, threshold=60):
     emg_data_filtered = np.copy(emg_data)
@@ -105,25 +105,33 @@ def filter_gyro_noise(gyro_data, threshold=50):
     gyro_data_filtered[np.abs(gyro_data) < threshold] = 0
     return gyro_data_filtered
 
+def push(buffer, items):
+    for item in items:
+        if buffer.full():
+            buffer.get()
+        buffer.put(item)
+
 def animate(i):
     # Myo Plot
+    emgs = []
+    imus = []
     while not q.empty():
         emg, quat, acc, gyro = q.get()
         if emg is not None:
-            if emg_queue.full():
-                emg_queue.get()
-            emg_queue.put(emg)
+            emgs.append(emg)
         if quat is not None and acc is not None and gyro is not None:
-            if imu_queue.full():
-                imu_queue.get()
-            imu_queue.put((quat, acc, gyro))
+            imus.append((quat, acc, gyro))
+
+    # Filter the new samples, the queues hold filtered samples
+    if emgs:
+        push(emg_queue, emg_filter.filter(emgs))
+    if imus:
+        quat, acc, gyro = (np.array(v, dtype=float) for v in zip(*imus))
+        push(imu_queue, zip(quat[:, 0], quat_filter.filter(quat[:, 1:]), acc_filter.filter(acc), gyro_filter.filter(gyro)))
 
     # Update EMG plot
     if emg_queue.full():
-        channels = np.array(list(emg_queue.queue))
-        fs = 200  # Sample rate
-        channels_filtered = butter_lowpass_filter(channels, 5, fs)
-        channels_filtered = filter_emg_noise(channels_filtered)
+        channels_filtered = filter_emg_noise(np.array(list(emg_queue.queue)))
         for i in range(SENSORS_EMG):
             channel = channels_filtered[:, i]
             lines_emg[i].set_ydata(channel)
@@ -132,22 +140,8 @@ def animate(i):
 
     # Update IMU plot
     if imu_queue.full():
-        quats = []
-        accs = []
-        gyros = []
-        for quat, acc, gyro in list(imu_queue.queue):
-            quats.append(quat)
-            accs.append(acc)
-            gyros.append(gyro)
-
-        acc_data = np.array(accs)
-        gyro_data = np.array(gyros)
-        quat_data = np.array(quats)
-
-        fs = 100  # Sample rate
-        acc_data_filtered = butter_lowpass_filter(acc_data, 2, fs)
-        gyro_data_filtered = filter_gyro_noise(butter_lowpass_filter(gyro_data, 2, fs))
-        quat_data_filtered = butter_lowpass_filter(quat_data[:, 1:], 2, fs)
+        quat_w, quat_data_filtered, acc_data_filtered, gyro_data_filtered = (np.array(v) for v in zip(*imu_queue.queue))
+        gyro_data_filtered = filter_gyro_noise(gyro_data_filtered)
 
         # Update lines for acceleration
         for i, line in enumerate(acc_lines):
@@ -169,7 +163,7 @@ def animate(i):
             subplots_imu[2].autoscale_view()
 
         # Update annotation for quat_w
-        quat_w_annotation.set_text(f'Quat_w: {quat_data[-1, 0]}')
+        quat_w_annotation.set_text(f'Quat_w: {quat_w[-1]}')
         quat_x_annotation.set_text(f'Quat_x: {quat_data_filtered[-1, 0]:.2f}')
         quat_y_annotation.set_text(f'Quat_y: {quat_data_filtered[-1, 1]:.2f}')
         quat_z_annotation.set_text(f'Quat_z: {quat_data_filtered[-1, 2]:.2f}')
@@ -3,9 +3,9 @@ import queue
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import animation
-from scipy.signal import butter, filtfilt
 from scipy.fft import fft, fftfreq
 from pyomyo import Myo, emg_mode
+from pyomyo.filters import FilterBank
 
 print("Press ctrl+pause/break to stop")
 
@@ -61,14 +61,13 @@ gyro_y_annotation = subplots[1].text(0.8, 0.75, '', transform=subplots[1].transA
 gyro_z_annotation = subplots[1].text(0.8, 0.7, '', transform=subplots[1].transAxes, fontsize=12)
 
 imu_queue = queue.Queue(QUEUE_SIZE)
+filtered_queue = queue.Queue(QUEUE_SIZE)
 
-# Butterworth filter function
-def butter_lowpass_filter(data, cutoff, fs, order=5):
-    nyquist = 0.5 * fs
-    normal_cutoff = cutoff / nyquist
-    b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    y = filtfilt(b, a, data, axis=0)
-    return y
+# Streaming Butterworth filters, each sample is filtered once as it arrives
+fs = 100  # Sample rate
+acc_filter = FilterBank(3, fs, [('lowpass', 2, 5)])
+quat_filter = FilterBank(3, fs, [('lowpass', 2, 5)])
+gyro_filter = FilterBank(3, fs, [('lowpass', 1, 5)])  # Más agresivo para el giroscopio
 
 def calculate_frequency(data, fs):
     N = len(data)
@@ -83,33 +82,25 @@ def filter_gyro_noise(gyro_data, threshold=50):
     return gyro_data_filtered
 
 def animate(i):
+    new = []
     while not q.empty():
-        imu = list(q.get())
-        quat, acc, gyro = imu
-
-        if imu_queue.full():
-            imu_queue.get()
-        imu_queue.put((quat, acc, gyro))
-
-    quats = []
-    accs = []
-    gyros = []
-
-    for quat, acc, gyro in list(imu_queue.queue):
-        quats.append(quat)
-        accs.append(acc)
-        gyros.append(gyro)
+        new.append(list(q.get()))
+
+    if new:
+        quat, acc, gyro = (np.array(v, dtype=float) for v in zip(*new))
+        quat_f = quat_filter.filter(quat[:, 1:])
+        acc_f = acc_filter.filter(acc)
+        gyro_f = gyro_filter.filter(gyro)
+        for j in range(len(new)):
+            if imu_queue.full():
+                imu_queue.get()
+                filtered_queue.get()
+            imu_queue.put((quat[j], acc[j], gyro[j]))
+            filtered_queue.put((quat_f[j], acc_f[j], gyro_f[j]))
 
     if imu_queue.full():
-        acc_data = np.array(accs)
-        gyro_data = np.array(gyros)
-        quat_data = np.array(quats)
-
-        # Apply filters
-        fs = 100  # Sample rate
-        acc_data_filtered = butter_lowpass_filter(acc_data, 2, fs)
-        quat_data_filtered = butter_lowpass_filter(quat_data[:, 1:], 2, fs)
-        gyro_data_filtered = butter_lowpass_filter(gyro_data, 1, fs)  # Más agresivo para el giroscopio
+        quat_data, acc_data, gyro_data = (np.array(v) for v in zip(*imu_queue.queue))
+        quat_data_filtered, acc_data_filtered, gyro_data_filtered = (np.array(v) for v in zip(*filtered_queue.queue))
         gyro_data_filtered = filter_gyro_noise(gyro_data_filtered)  # Filtro de 50 unidades
 
         # Update lines for acceleration
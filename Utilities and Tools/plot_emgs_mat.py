@@ -17,8 +17,10 @@ def worker(q):
     m = Myo(mode=emg_mode.PREPROCESSED)
     m.connect()
     
-    def add_to_queue(emg, movement):
-        q.put(emg)
+    def add_to_queue(emg, times):
+        # One put per block of samples instead of one per sample,
+        # copied as the queue pickles it later and the block is reused
+        q.put(emg.copy())
 
     def print_battery(bat):
         print("Battery level:", bat)
@@ -28,7 +30,7 @@ def worker(q):
     # Vibrate to know we connected okay
     m.vibrate(1)
     m.add_battery_handler(print_battery)
-    m.add_emg_handler(add_to_queue)
+    m.add_emg_batch_handler(add_to_queue, size=10, latency=0.05)
 
     """worker function"""
     while True:
@@ -64,10 +66,10 @@ emg_queue = queue.Queue(QUEUE_SIZE)
 def animate(i):
     # Myo Plot
     while not (q.empty()):
-        myox = list(q.get())
-        if (emg_queue.full()):
-            emg_queue.get()
-        emg_queue.put(myox)
+        for myox in q.get().tolist():
+            if (emg_queue.full()):
+                emg_queue.get()
+            emg_queue.put(myox)
 
     channels = np.array(emg_queue.queue)
 
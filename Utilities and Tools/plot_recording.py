@@ -0,0 +1,52 @@
+# Browse a recording
+# python plot_recording.py session.myo [emg|imu]
+# Draws the min/max envelope of every channel from the decimation pyramid,
+# refetching at screen resolution whenever the plot is zoomed or panned.
+import sys
+
+import matplotlib.pyplot as plt
+
+from pyomyo.recording import Recording
+
+PIXELS = 1500
+
+def main(path, stream):
+	r = Recording(path)
+	start = r.start
+	width = r.streams[stream][1]
+
+	fig, axes = plt.subplots(width, 1, sharex=True, figsize=(15, 10))
+	fig.suptitle(f"{path} - {stream}")
+	# Redrawing sets the limits again, which must not trigger another redraw
+	drawing = [False]
+
+	def draw(t0=None, t1=None):
+		drawing[0] = True
+		times, low, high, mean = r.view(stream, t0, t1, pixels=PIXELS)
+		x = (times - start) / 1e9
+		for ch, ax in enumerate(axes):
+			xlim = ax.get_xlim()
+			ax.clear()
+			ax.fill_between(x, low[:, ch], high[:, ch], step='post', linewidth=0)
+			ax.plot(x, mean[:, ch], linewidth=0.5, color='k')
+			ax.set_ylabel(f"Ch {ch + 1}")
+			if t0 is not None:
+				ax.set_xlim(xlim)
+		axes[-1].set_xlabel("Time (s)")
+		fig.canvas.draw_idle()
+		drawing[0] = False
+
+	def on_xlim(ax):
+		if drawing[0]:
+			return
+		x0, x1 = ax.get_xlim()
+		# Fetch a screen's width either side so small pans need no refetch
+		span = x1 - x0
+		draw(start + int((x0 - span) * 1e9), start + int((x1 + span) * 1e9))
+
+	draw()
+	axes[0].callbacks.connect('xlim_changed', on_xlim)
+	plt.show()
+
+if __name__ == '__main__':
+	main(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'emg')
@@ -0,0 +1,67 @@
+# SampleClock check
+# Feeds SampleClock simulated arrivals, with jitter, lost packets and stalls,
+# and checks the rebuilt sample indices and times against the true ones,
+# no Myo or dongle needed.
+# python sample_clock_check.py
+import random
+
+import numpy as np
+
+from pyomyo.pyomyo import SampleClock
+
+SECONDS = 60
+
+def simulate(rate=200, n=2, loss=0.0, jitter=0.002, stall=0.0, seed=0, drift=50e-6):
+	'''
+	Streams packets of n samples at rate, with a clock drift, a 1 ms delay
+	plus up to jitter seconds, in order, packets lost with probability loss
+	and stalls of 50 to 300 ms starting with probability stall. Returns the
+	fraction of right indices, the mean time error in ms, after the usual
+	delay, and the samples counted lost less those actually lost.
+	'''
+	rng = random.Random(seed)
+	clock = SampleClock(rate)
+	period = 1e9 / rate * (1 + drift)
+	t0 = 1e12
+	last = stalled = 0
+	lost = 0
+	# Lost before the last packet given its right index, the clock can't know of later ones
+	lost_seen = 0
+	right = []
+	errors = []
+	for k in range(int(SECONDS * rate / n)):
+		if rng.random() < loss:
+			lost += n
+			continue
+		# Sent once its last sample is taken
+		t = t0 + (k * n + n - 1) * period + 1e6 + rng.uniform(0, jitter * 1e9)
+		if rng.random() < stall:
+			stalled = t + rng.uniform(0.05, 0.3) * 1e9
+		t = last = max(t, stalled, last)
+		index, t_sample = clock.update(int(t), n)
+		if index == k * n:
+			lost_seen = lost
+		# Skip the first second, while the clock settles
+		if k * n >= rate:
+			right.append(index == k * n)
+			errors.append(t_sample - (t0 + k * n * period))
+	errors = np.array(errors)
+	return np.mean(right), (errors - np.median(errors)).mean() / 1e6, clock.lost - lost_seen
+
+CASES = [
+	# name, arguments, minimum fraction of right indices
+	('steady', {}, 0.999),
+	('sparse loss', {'loss': 0.01}, 0.95),
+	('sparse loss, IMU', {'rate': 50, 'n': 1, 'loss': 0.01}, 0.95),
+	('heavy jitter', {'jitter': 0.02}, 0.999),
+	('stalls', {'stall': 0.005}, 0.999),
+]
+
+if __name__ == '__main__':
+	for name, kwargs, minimum in CASES:
+		for seed in range(3):
+			right, bias, extra = simulate(seed=seed, **kwargs)
+			print(f"{name}, seed {seed}: {right:.1%} indices right, {bias:+.2f} ms bias, {extra:+d} lost")
+			assert right >= minimum, 'sample indices off'
+			assert abs(bias) < 1, 'sample times biased'
+			assert extra == 0, 'lost samples miscounted'
@@ -21,9 +21,10 @@ IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
 CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 '''
 
-from collections import Counter, deque
+import copy
 import struct
 import sys
+import threading
 import time
 
 import pygame
@@ -31,82 +32,363 @@ from pygame.locals import *
 import numpy as np
 
 from pyomyo import Myo, emg_mode
+from pyomyo.store import SampleBuffer, TrainingStore
 
 SUBSAMPLE = 3
 K = 15
+# One label per number key
+LABELS = [str(i) for i in range(10)]
+
+class Trainer(object):
+	'''
+	Retrains a classifier in a background thread.
+
+	submit() only keeps the latest training data. The thread fits a model on
+	it once delay seconds pass without new data, or as soon as samples more
+	samples arrived than the current model was fitted on, so recording a
+	class retrains about once per samples samples and once more when it
+	stops. The new model replaces cls.model only when it is fitted, so
+	classify() keeps using the previous model meanwhile. That model may
+	cover fewer samples than cls.X, or be None, so classify() checks the
+	model it reads, never cls.X. A fit that raises keeps the previous model
+	and leaves the exception in error.
+	'''
+	def __init__(self, cls, delay=0.5, samples=1000):
+		self.cls = cls
+		self.delay = delay
+		self.samples = samples
+		self.cond = threading.Condition()
+		self.pending = None
+		self.last = 0
+		# Samples the current model was fitted on, None before the first fit
+		self.fitted = None
+		self.fitting = False
+		self.error = None
+		self.running = True
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def submit(self, X, Y):
+		with self.cond:
+			self.pending = (X, Y)
+			self.last = time.monotonic()
+			self.cond.notify_all()
+
+	def due(self):
+		'''Seconds until the pending data is to be fitted, 0 when now.'''
+		X, _ = self.pending
+		if self.fitted is None or abs(len(X) - self.fitted) >= self.samples:
+			return 0
+		return max(self.last + self.delay - time.monotonic(), 0)
+
+	def run(self):
+		while True:
+			with self.cond:
+				while self.running and (self.pending is None or self.due() > 0):
+					self.cond.wait(None if self.pending is None else self.due())
+				if not self.running:
+					return
+				X, Y = self.pending
+				self.pending = None
+				self.fitting = True
+			try:
+				self.cls.model = self.cls.fit(X, Y)
+				self.error = None
+			except Exception as e:
+				self.error = e
+			with self.cond:
+				self.fitted = len(X)
+				self.fitting = False
+				self.cond.notify_all()
+
+	def wait(self, timeout=None):
+		'''Fits any pending data now and waits until it is done, returns whether it is.'''
+		with self.cond:
+			self.last = 0
+			self.cond.notify_all()
+			return self.cond.wait_for(lambda: self.pending is None and not self.fitting, timeout)
+
+	def stop(self):
+		with self.cond:
+			self.running = False
+			self.cond.notify_all()
+		self.thread.join()
+
+
+class NeighbourIndex(object):
+	'''
+	The k nearest neighbours of samples among the training samples X.
+
+	X is kept in float32 along with the squared norm of each row, so the
+	squared distances to d, |x|^2 - 2 x.d + |d|^2, take one matrix product,
+	and |d|^2, the same for every row, is not needed to rank them. extend()
+	adds rows without touching the others, growing by doubling. Queries read
+	a consistent snapshot, so another thread can extend the index meanwhile.
+	source is the SampleBuffer indexed, if any.
+	'''
+	def __init__(self, width=8, k=1, source=None):
+		self.k = k
+		self.source = source
+		self.arrays = (np.empty((0, width), np.float32), np.empty(0, np.float32), np.empty(0, np.int64), 0)
+
+	def __len__(self):
+		return self.arrays[3]
+
+	def extend(self, X, Y):
+		x, norms, y, n = self.arrays
+		X = np.asarray(X, np.float32).reshape(-1, x.shape[1])
+		m = n + len(X)
+		if m > len(x):
+			capacity = max(2 * len(x), m, 1024)
+			x, norms, y = (np.concatenate((a[:n], np.empty((capacity - n,) + a.shape[1:], a.dtype))) for a in (x, norms, y))
+		# Rows past n are invisible to queries until the snapshot is replaced
+		x[n:m] = X
+		np.einsum('ij,ij->i', X, X, out=norms[n:m])
+		y[n:m] = Y
+		self.arrays = (x, norms, y, m)
+
+	def neighbours(self, d, k=None):
+		'''Indices of the k nearest rows to d, nearest first.'''
+		x, norms, _, n = self.arrays
+		k = min(self.k if k is None else k, n)
+		if n == 0:
+			return np.empty(0, np.int64)
+		dists = norms[:n] - 2 * (x[:n] @ np.asarray(d, np.float32))
+		if k == 1:
+			return dists.argmin().reshape(1)
+		ind = np.argpartition(dists, k - 1)[:k]
+		return ind[np.argsort(dists[ind])]
+
+	def classify(self, d):
+		'''
+		Majority label of the k nearest rows to d, ties going to the nearest,
+		0 while the index is empty.
+		'''
+		y = self.arrays[2][self.neighbours(d)]
+		if len(y) == 0:
+			return 0
+		if len(y) == 1:
+			return y[0]
+		counts = np.bincount(y)
+		return y[counts[y] == counts.max()][0]
+
+	def classify_batch(self, D, rows=1 << 22):
+		'''
+		classify() of every row of D, computing the distances of blocks of
+		rows distances at a time.
+		'''
+		x, norms, y, n = self.arrays
+		D = np.asarray(D, np.float32).reshape(-1, x.shape[1])
+		k = min(self.k, n)
+		if n == 0:
+			return np.zeros(len(D), np.int64)
+		out = np.empty(len(D), np.int64)
+		step = max(rows // max(n, 1), 1)
+		for i in range(0, len(D), step):
+			dists = norms[:n] - 2 * (D[i:i + step] @ x[:n].T)
+			if k == 1:
+				out[i:i + step] = y[dists.argmin(axis=1)]
+				continue
+			ind = np.argpartition(dists, k - 1, axis=1)[:, :k]
+			ind = np.take_along_axis(ind, np.argsort(np.take_along_axis(dists, ind, 1), axis=1), 1)
+			labels = y[ind]
+			# Votes of each row for each label, the first label reaching the most is the nearest
+			m = len(labels)
+			width = int(labels.max()) + 1
+			counts = np.bincount((np.arange(m)[:, None] * width + labels).ravel(), minlength=m * width).reshape(m, width)
+			votes = np.take_along_axis(counts, labels, 1)
+			out[i:i + step] = labels[np.arange(m), (votes == votes.max(axis=1, keepdims=True)).argmax(axis=1)]
+		return out
+
 
 class Classifier(object):
 	'''A wrapper for nearest-neighbor classifier that stores
-	training data in vals0, ..., vals9.dat.'''
+	training data in a TrainingStore under root, one segment per label.
+
+	train() fits the model returned by fit() right away, or, with
+	background, hands the data to a Trainer that fits it later in a thread,
+	delay and samples setting when. The model of nearest neighbour is a
+	NeighbourIndex voting among the k nearest samples, extended in place as
+	samples are stored.'''
 
-	def __init__(self, name="Classifier", color=(0,200,0)):
+	def __init__(self, name="Classifier", color=(0,200,0), labels=LABELS, root='data',
+			background=False, delay=0.5, samples=1000, k=1):
 		# Add some identifiers to the classifier to identify what model was used in different screenshots
 		self.name = name
 		self.color = color
+		self.k = k
 
-		for i in range(10):
-			with open('data/vals%d.dat' % i, 'ab') as f: pass
+		self.model = None
+		self.trainer = Trainer(self, delay, samples) if background else None
+		self.store = TrainingStore(root, labels)
 		self.read_data()
 
-	def store_data(self, cls, vals):
-		with open('data/vals%d.dat' % cls, 'ab') as f:
-			f.write(pack('8H', *vals))
+	@property
+	def labels(self):
+		return self.store.labels
 
-		self.train(np.vstack([self.X, vals]), np.hstack([self.Y, [cls]]))
+	def count(self, cls):
+		'''Number of training samples of class cls.'''
+		return self.store.count(cls)
 
-	def read_data(self):
-		X = []
-		Y = []
-		for i in range(10):
-			X.append(np.fromfile('data/vals%d.dat' % i, dtype=np.uint16).reshape((-1, 8)))
-			Y.append(i + np.zeros(X[-1].shape[0]))
+	def store_data(self, cls, vals):
+		self.store.append(cls, vals)
+		self.train(*self.data.append(vals, self.store.index(cls)))
 
-		self.train(np.vstack(X), np.hstack(Y))
+	def read_data(self):
+		self.data = SampleBuffer(*self.store.arrays())
+		self.train(self.data.X, self.data.Y)
 
 	def delete_data(self):
-		for i in range(10):
-			with open('data/vals%d.dat' % i, 'wb') as f: pass
+		self.store.clear()
 		self.read_data()
 
 	def train(self, X, Y):
 		self.X = X
 		self.Y = Y
-		self.model = None
+		if self.trainer is None:
+			self.model = self.fit(X, Y)
+		else:
+			self.trainer.submit(X, Y)
+
+	def fit(self, X, Y):
+		'''A model fitted on X, Y, for nearest neighbour the index of them.'''
+		index = self.model
+		# Samples are only ever appended to data, the index needs just the new ones
+		if not isinstance(index, NeighbourIndex) or index.source is not self.data or len(index) > len(X):
+			index = NeighbourIndex(X.shape[1], self.k, self.data)
+		index.extend(X[len(index):], Y[len(index):])
+		return index
+
+	def close(self):
+		if self.trainer is not None:
+			self.trainer.stop()
+		self.store.close()
 
 	def nearest(self, d):
-		dists = ((self.X - d)**2).sum(1)
-		ind = dists.argmin()
-		return self.Y[ind]
+		return int(self.model.classify(d))
 
 	def classify(self, d):
-		if self.X.shape[0] < K * SUBSAMPLE: return 0
-		return self.nearest(d)
+		# The model read, not X, may be fitted on fewer samples in the background
+		model = self.model
+		if model is None or len(model) < K * SUBSAMPLE: return 0
+		return int(model.classify(d))
+
+	def classify_batch(self, block):
+		'''Classes of every sample of the N x 8 block, in one call.'''
+		model = self.model
+		if model is None or len(model) < K * SUBSAMPLE:
+			return np.zeros(len(block), np.int64)
+		return model.classify_batch(block)
+
+class VoteSmoother(object):
+	'''
+	Smooths the classes of consecutive samples by a majority vote over the
+	last length of them.
+
+	The count of each class is kept in a list, and the classes in buckets by
+	count, so mode, the most common class, is kept up to date in constant
+	time per sample whatever the number of classes. The window starts full
+	of class 0.
+
+	add() reports a new pose when rule(counts, mode, pose) allows it. By
+	default that is when mode is more common than the current pose by more
+	than margin samples and fills more than majority of the window, the rule
+	MyoClassifier always used. margin=0, majority=0 reports every change of
+	mode. latency is the number of samples a clean change of class takes to
+	be reported, the delay the smoothing adds.
+	'''
+	def __init__(self, length=25, classes=10, margin=5, majority=0.5, rule=None):
+		self.length = length
+		self.margin = margin
+		self.majority = majority
+		self.rule = self.margin_rule if rule is None else rule
+		self.window = [0] * length
+		self.head = 0
+		self.counts = [length] + [0] * (classes - 1)
+		self.buckets = [set() for _ in range(length + 1)]
+		self.buckets[0].update(range(1, classes))
+		self.buckets[length].add(0)
+		# Highest count
+		self.top = length
+		self.mode = 0
+		self.pose = None
+		self.step = None
+
+	def margin_rule(self, counts, mode, pose):
+		n = counts[mode]
+		return n > counts[pose] + self.margin and n > self.length * self.majority
+
+	def move(self, c, d):
+		n = self.counts[c]
+		self.buckets[n].discard(c)
+		self.counts[c] = n + d
+		self.buckets[n + d].add(c)
+
+	def add(self, y):
+		'''Adds the class y of the latest sample, returns the new pose or None.'''
+		if y >= len(self.counts):
+			self.buckets[0].update(range(len(self.counts), y + 1))
+			self.counts.extend([0] * (y + 1 - len(self.counts)))
+		old = self.window[self.head]
+		self.window[self.head] = y
+		self.head = (self.head + 1) % self.length
+		if old != y:
+			self.move(y, 1)
+			self.top = max(self.top, self.counts[y])
+			self.move(old, -1)
+			if not self.buckets[self.top]:
+				self.top -= 1
+			if self.counts[self.mode] < self.top:
+				self.mode = y if self.counts[y] == self.top else next(iter(self.buckets[self.top]))
+
+		if self.pose is None or (self.mode != self.pose and self.rule(self.counts, self.mode, self.pose)):
+			self.pose = self.mode
+			return self.pose
+		return None
+
+	@property
+	def latency(self):
+		'''Samples from a clean change of class to its report, None if never.'''
+		if self.step is None:
+			s = VoteSmoother(self.length, 2, self.margin, self.majority, self.rule)
+			s.add(0)
+			for n in range(1, 2 * self.length + 1):
+				if s.add(1) is not None:
+					self.step = n
+					break
+			else:
+				self.step = -1
+		return self.step if self.step >= 0 else None
+
 
 class MyoClassifier(Myo):
-	'''Adds higher-level pose classification and handling onto Myo.'''
+	'''Adds higher-level pose classification and handling onto Myo.
+
+	EMG is classified in blocks of up to batch samples with
+	cls.classify_batch(), a block being classified once it is full or its
+	oldest sample is latency seconds old. Poses are reported by smoother, a
+	VoteSmoother over the last hist_len samples by default.'''
 
-	def __init__(self, cls, tty=None, mode=emg_mode.PREPROCESSED, hist_len=25):
+	def __init__(self, cls, tty=None, mode=emg_mode.PREPROCESSED, hist_len=25, batch=10, latency=0.05, smoother=None):
 		Myo.__init__(self, tty, mode=mode)
 		# Add a classifier
 		self.cls = cls
 		self.hist_len = hist_len
-		self.history = deque([0] * self.hist_len, self.hist_len)
-		self.history_cnt = Counter(self.history)
-		self.add_emg_handler(self.emg_handler)
-		self.last_pose = None
+		self.smoother = VoteSmoother(hist_len, len(cls.labels)) if smoother is None else smoother
+		self.add_emg_batch_handler(self.emg_batch_handler, size=batch, latency=latency)
 
 		self.pose_handlers = []
 
-	def emg_handler(self, emg, moving):
-		y = self.cls.classify(emg)
-		self.history_cnt[self.history[0]] -= 1
-		self.history_cnt[y] += 1
-		self.history.append(y)
+	def emg_batch_handler(self, emg, times):
+		for y in self.cls.classify_batch(emg).tolist():
+			self.vote(y)
 
-		r, n = self.history_cnt.most_common(1)[0]
-		if self.last_pose is None or (n > self.history_cnt[self.last_pose] + 5 and n > self.hist_len / 2):
-			self.on_raw_pose(r)
-			self.last_pose = r
+	def vote(self, y):
+		'''Adds the class y of the latest sample to the smoother.'''
+		pose = self.smoother.add(y)
+		if pose is not None:
+			self.on_raw_pose(pose)
 
 	def add_raw_pose_handler(self, h):
 		self.pose_handlers.append(h)
@@ -121,14 +403,14 @@ class MyoClassifier(Myo):
 			if ev.type == QUIT or (ev.type == KEYDOWN and ev.unicode == 'q'):
 				raise KeyboardInterrupt()
 			elif ev.type == KEYDOWN:
-				if K_0 <= ev.key <= K_9:
+				if K_0 <= ev.key <= K_9 and ev.key - K_0 < len(self.cls.labels):
 					# Labelling using row of numbers
 					hnd.recording = ev.key - K_0
-				elif K_KP0 <= ev.key <= K_KP9:
+				elif K_KP0 <= ev.key <= K_KP9 and ev.key - K_KP0 < len(self.cls.labels):
 					# Labelling using Keypad
-					hnd.recording = ev.key - K_Kp0
+					hnd.recording = ev.key - K_KP0
 				elif ev.unicode == 'r':
-					hnd.cl.read_data()
+					self.cls.read_data()
 				elif ev.unicode == 'e':
 					print("Pressed e, erasing local data")
 					self.cls.delete_data()
@@ -139,23 +421,23 @@ class MyoClassifier(Myo):
 
 		# Plotting
 		scr.fill((0, 0, 0), (0, 0, w, h))
-		r = self.history_cnt.most_common(1)[0][0]
+		r = self.smoother.mode
 
-		for i in range(10):
+		for i, label in enumerate(self.cls.labels[:10]):
 			x = 0
 			y = 0 + 30 * i
 			# Set the barplot color
 			clr = self.cls.color if i == r else (255,255,255)
 
-			txt = font.render('%5d' % (self.cls.Y == i).sum(), True, (255,255,255))
+			txt = font.render('%5d' % self.cls.count(i), True, (255,255,255))
 			scr.blit(txt, (x + 20, y))
 
-			txt = font.render('%d' % i, True, clr)
+			txt = font.render(label, True, clr)
 			scr.blit(txt, (x + 110, y))
 
 			# Plot the barchart plot
-			scr.fill((0,0,0), (x+130, y + txt.get_height() / 2 - 10, len(self.history) * 20, 20))
-			scr.fill(clr, (x+130, y + txt.get_height() / 2 - 10, self.history_cnt[i] * 20, 20))
+			scr.fill((0,0,0), (x+130, y + txt.get_height() / 2 - 10, self.smoother.length * 20, 20))
+			scr.fill(clr, (x+130, y + txt.get_height() / 2 - 10, self.smoother.counts[i] * 20, 20))
 
 		pygame.display.flip()
 
@@ -184,27 +466,37 @@ class Live_Classifier(Classifier):
 	'''
 	General class for all Sklearn classifiers
 	Expects something you can call .fit and .predict on
+	Copies of it are fitted in the background, see Trainer
 	'''
-	def __init__(self, classifier, name="Live Classifier", color=(0,55,175)):
-		self.model = classifier
-		Classifier.__init__(self, name=name, color=color)
-
-	def train(self, X, Y):
-		self.X = X
-		self.Y = Y
-
-		if self.X.shape[0] > 0 and self.Y.shape[0] > 0: 
-			self.model.fit(self.X, self.Y)
+	def __init__(self, classifier, name="Live Classifier", color=(0,55,175), background=True, **kwargs):
+		self.estimator = classifier
+		Classifier.__init__(self, name=name, color=color, background=background, **kwargs)
+
+	def fit(self, X, Y):
+		if X.shape[0] == 0 or self.estimator is None:
+			return None
+		# A fresh copy, the model in use is never refitted in place
+		model = copy.deepcopy(self.estimator)
+		model.fit(X, Y)
+		return model
 
 	def classify(self, emg):
-		if self.X.shape[0] == 0 or self.model == None:
-			# We have no data or model, return 0
+		model = self.model
+		if model is None:
+			# No model fitted yet, fit() returns None without data, return 0
 			return 0
 
 		x = np.array(emg).reshape(1,-1)
-		pred = self.model.predict(x)
+		pred = model.predict(x)
 		return int(pred[0])
 
+	def classify_batch(self, block):
+		model = self.model
+		if model is None:
+			return np.zeros(len(block), np.int64)
+
+		return np.asarray(model.predict(np.asarray(block)), np.int64).reshape(-1)
+
 if __name__ == '__main__':
 	pygame.init()
 	w, h = 800, 320
@@ -232,5 +524,7 @@ if __name__ == '__main__':
 		pass
 	finally:
 		m.disconnect()
+		# Cuts the training files back to their samples
+		m.cls.close()
 		print()
 		pygame.quit()
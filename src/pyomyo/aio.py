@@ -0,0 +1,285 @@
+'''
+asyncio client for the Myo.
+
+AsyncMyo drives the serial port from the event loop: on POSIX the port is
+put in non-blocking mode and watched with loop.add_reader, so any number of
+armbands and sockets share one loop without a thread per device. Where the
+loop cannot watch the port (Windows) a single I/O thread reads it and hands
+the bytes to the loop.
+
+	async def main():
+		m = AsyncMyo(mode=emg_mode.FILTERED)
+		await m.connect()
+		await m.vibrate(1)
+		async for emg, moving in m.emg():
+			...
+'''
+
+import asyncio
+import collections
+import threading
+
+from pyomyo.pyomyo import ATTR_HEADER, Myo, emg_mode, pack
+
+# Queued after the last event of a subscription
+END = object()
+
+class Subscription(object):
+	'''
+	Async iterator over the events of one kind published by an AsyncMyo.
+
+	A subscription holds at most maxsize undelivered events, when its
+	consumer falls behind the oldest ones are dropped and counted in dropped.
+	The port keeps being read, so command responses and the other
+	subscriptions are never held up by a slow consumer. Iterating ends once
+	the subscription or the AsyncMyo is closed, and raises the error of the
+	port if reading it failed.
+	'''
+	def __init__(self, myo, kind, maxsize):
+		self.myo = myo
+		self.kind = kind
+		self.maxsize = maxsize
+		self.queue = asyncio.Queue()
+		self.dropped = 0
+		self.ended = False
+		self.error = None
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		item = await self.queue.get()
+		if item is END:
+			# Left for any other waiter
+			self.queue.put_nowait(END)
+			if self.error is not None:
+				raise self.error
+			raise StopAsyncIteration
+		return item
+
+	def put(self, item):
+		if self.ended:
+			return
+		if self.queue.qsize() >= self.maxsize:
+			self.queue.get_nowait()
+			self.dropped += 1
+		self.queue.put_nowait(item)
+
+	def end(self, error=None):
+		'''Wakes the consumers, which stop iterating, raising error if given.'''
+		if self.ended:
+			return
+		self.ended = True
+		self.error = error
+		self.queue.put_nowait(END)
+
+	def close(self):
+		'''Unsubscribes, events are no longer queued for it and iterating ends.'''
+		subs = self.myo.subscribers[self.kind]
+		if self in subs:
+			subs.remove(self)
+		self.end()
+
+
+class AsyncMyo(object):
+	'''Implements the Myo protocol on top of an asyncio event loop.'''
+
+	def __init__(self, tty=None, mode=emg_mode.PREPROCESSED, maxsize=1024):
+		# The Myo does the decoding, AsyncMyo only feeds it packets
+		self.myo = Myo(tty, mode=mode)
+		self.bt = self.myo.bt
+		self.maxsize = maxsize
+		self.loop = None
+		self.thread = None
+		# Set while Myo.connect runs in the executor, events then come from its thread
+		self.connecting = False
+
+		# Futures waiting for command responses, in the order sent
+		self.responses = collections.deque()
+		# (cls, cmd, attr, future) waiting for events, attr None for any
+		self.events = []
+		self.gatt_lock = None
+		self.fd = None
+		# Set when reading the port failed
+		self.error = None
+
+		self.subscribers = {'emg': [], 'imu': [], 'pose': [], 'arm': [], 'battery': []}
+		self.myo.add_emg_handler(lambda emg, moving: self.publish('emg', (emg, moving)))
+		self.myo.add_imu_handler(lambda quat, acc, gyro: self.publish('imu', (quat, acc, gyro)))
+		self.myo.add_pose_handler(lambda p: self.publish('pose', p))
+		self.myo.add_arm_handler(lambda arm, xdir: self.publish('arm', (arm, xdir)))
+		self.myo.add_battery_handler(lambda b: self.publish('battery', b))
+
+	async def connect(self, addr=None):
+		'''
+		Connects and starts streaming. The connection handshake reuses the
+		blocking Myo.connect in the default executor, the port is only handed
+		to the loop once it is done.
+		'''
+		self.loop = asyncio.get_running_loop()
+		self.gatt_lock = asyncio.Lock()
+		self.connecting = True
+		try:
+			await self.loop.run_in_executor(None, self.myo.connect, addr)
+		finally:
+			self.connecting = False
+		self.start()
+
+	# Reading
+	def start(self):
+		try:
+			fd = self.bt.ser.fileno()
+			self.bt.ser.timeout = 0
+			self.loop.add_reader(fd, self.on_readable)
+			self.fd = fd
+		except (AttributeError, NotImplementedError, OSError, ValueError):
+			# Loop or port without fd support, read from a thread instead
+			self.fd = None
+			self.thread = threading.Thread(target=self.read_thread, daemon=True)
+			self.thread.start()
+
+	def on_readable(self):
+		try:
+			data = self.bt.ser.read(self.bt.ser.in_waiting or 1)
+		except Exception as e:
+			self.fail(e)
+			return
+		if data:
+			self.feed(data, self.bt.clock())
+
+	def read_thread(self):
+		ser = self.bt.ser
+		ser.timeout = 0.1
+		try:
+			while self.thread is not None:
+				data = ser.read(ser.in_waiting or 1)
+				if data:
+					# Stamped here, not when the loop gets to it
+					self.loop.call_soon_threadsafe(self.feed, data, self.bt.clock())
+		except Exception as e:
+			if self.thread is not None:
+				self.loop.call_soon_threadsafe(self.fail, e)
+
+	def stop_reading(self):
+		if self.fd is not None:
+			self.loop.remove_reader(self.fd)
+			self.fd = None
+		self.thread = None
+
+	def fail(self, error):
+		'''
+		Stops reading after the port failed with error, which the pending
+		commands and the subscriptions raise.
+		'''
+		self.stop_reading()
+		self.error = error
+		for fut in list(self.responses) + [ev[3] for ev in self.events]:
+			if not fut.done():
+				fut.set_exception(error)
+		self.responses.clear()
+		self.events = []
+		for subs in self.subscribers.values():
+			for s in subs:
+				s.end(error)
+
+	def feed(self, data, t):
+		'''Handles the packets of data, read at time t.'''
+		for p in self.bt.framer.feed(data, t):
+			if p.typ == 0:
+				if self.responses:
+					fut = self.responses.popleft()
+					if not fut.done():
+						fut.set_result(p.copy())
+				continue
+
+			if self.events and self.resolve_event(p):
+				continue
+			self.bt.handle_event(p)
+
+	def resolve_event(self, p):
+		for i, (cls, cmd, attr, fut) in enumerate(self.events):
+			if p.cls != cls or p.cmd != cmd:
+				continue
+			if attr is not None and ATTR_HEADER.unpack_from(p.payload)[1] != attr:
+				continue
+			del self.events[i]
+			if not fut.done():
+				fut.set_result(p.copy())
+			return True
+		return False
+
+	def publish(self, kind, item):
+		if self.connecting:
+			# asyncio queues are not thread-safe, deliver from the loop
+			self.loop.call_soon_threadsafe(self.deliver, kind, item)
+		else:
+			self.deliver(kind, item)
+
+	def deliver(self, kind, item):
+		for s in self.subscribers[kind]:
+			s.put(item)
+
+	# Event iterators
+	def subscribe(self, kind, maxsize=None):
+		s = Subscription(self, kind, maxsize or self.maxsize)
+		self.subscribers[kind].append(s)
+		if self.error is not None:
+			s.end(self.error)
+		return s
+
+	def emg(self, maxsize=None):
+		return self.subscribe('emg', maxsize)
+
+	def imu(self, maxsize=None):
+		return self.subscribe('imu', maxsize)
+
+	def poses(self, maxsize=None):
+		return self.subscribe('pose', maxsize)
+
+	# Commands
+	def expect_event(self, cls, cmd, attr=None):
+		fut = self.loop.create_future()
+		self.events.append((cls, cmd, attr, fut))
+		return fut
+
+	async def send_command(self, cls, cmd, payload=b''):
+		if self.error is not None:
+			raise self.error
+		fut = self.loop.create_future()
+		self.responses.append(fut)
+		self.bt.ser.write(pack('4B', 0, len(payload), cls, cmd) + payload)
+		return await fut
+
+	async def read_attr(self, attr):
+		async with self.gatt_lock:
+			# Notifications share the event, wait for the value of attr
+			ev = self.expect_event(4, 5, attr)
+			await self.send_command(4, 4, pack('BH', self.myo.conn, attr))
+			return await ev
+
+	async def write_attr(self, attr, val):
+		async with self.gatt_lock:
+			ev = self.expect_event(4, 1)
+			await self.send_command(4, 5, pack('BHB', self.myo.conn, attr, len(val)) + val)
+			return await ev
+
+	async def vibrate(self, length):
+		if length in range(1, 4):
+			await self.write_attr(0x19, pack('3B', 3, 1, length))
+
+	async def set_leds(self, logo, line):
+		await self.write_attr(0x19, pack('8B', 6, 6, *(logo + line)))
+
+	async def sleep_mode(self, mode):
+		await self.write_attr(0x19, pack('3B', 9, 1, mode))
+
+	async def disconnect(self):
+		if self.myo.conn is not None:
+			await self.send_command(3, 0, pack('B', self.myo.conn))
+
+	def close(self):
+		self.stop_reading()
+		for subs in self.subscribers.values():
+			for s in subs:
+				s.end()
+		self.bt.ser.close()
@@ -0,0 +1,99 @@
+'''
+Block codec for integer sample arrays.
+
+Consecutive Myo samples are close to each other, so a block is stored as the
+differences between consecutive samples of each column, zigzag encoded so
+small negative differences are small unsigned numbers too, laid out column
+by column and byte plane by byte plane, and compressed with zlib or lzma.
+Every step is a NumPy array operation, and blocks are independent so any of
+them decodes on its own.
+
+	data = encode([times[:, None], emg], ZLIB)
+	times, emg = decode(data, [(n, np.int64, 1), (n, np.int8, 8)], ZLIB)
+
+Differences wrap around in the width of the type, so the encoding is exact
+for any values and the deltas of int8 EMG stay one byte. RAW stores the
+arrays as they are, one after the other, and decodes to views of the data.
+'''
+
+import lzma
+import zlib
+
+import numpy as np
+
+RAW = 0
+ZLIB = 1
+LZMA = 2
+CODECS = {'raw': RAW, 'zlib': ZLIB, 'lzma': LZMA}
+
+def signed(dtype):
+	return np.dtype('i%d' % np.dtype(dtype).itemsize)
+
+def unsigned(dtype):
+	return np.dtype('u%d' % np.dtype(dtype).itemsize)
+
+def delta_zigzag(a):
+	'''Zigzag encoded differences down the columns of the 2D integer array a.'''
+	s = a.view(signed(a.dtype))
+	d = np.empty_like(s)
+	d[:1] = s[:1]
+	np.subtract(s[1:], s[:-1], out=d[1:])
+	bits = 8 * s.dtype.itemsize
+	return ((d << 1) ^ (d >> (bits - 1))).view(unsigned(a.dtype))
+
+def undelta_zigzag(u, dtype):
+	'''Inverse of delta_zigzag, returns a dtype array.'''
+	s = signed(dtype)
+	d = (u >> 1).view(s) ^ -(u & 1).view(s)
+	return np.cumsum(d, axis=0, dtype=s).view(dtype)
+
+def shuffle(u):
+	'''The bytes of u, column by column, most varying byte planes first.'''
+	k = u.dtype.itemsize
+	cols = np.ascontiguousarray(u.T)
+	if k == 1:
+		return cols.tobytes()
+	return np.ascontiguousarray(cols.view(np.uint8).reshape(-1, k).T).tobytes()
+
+def unshuffle(data, offset, n, dtype, width):
+	'''Inverse of shuffle for the n x width block at offset in data.'''
+	k = np.dtype(dtype).itemsize
+	planes = np.frombuffer(data, np.uint8, n * width * k, offset)
+	if k > 1:
+		planes = np.ascontiguousarray(planes.reshape(k, -1).T)
+	return planes.view(unsigned(dtype)).reshape(width, n).T
+
+def encode(arrays, codec=ZLIB, level=None):
+	'''Encodes the 2D integer arrays, all with the same rows, into one block.'''
+	if codec == RAW:
+		return b''.join(np.ascontiguousarray(a).tobytes() for a in arrays)
+	data = b''.join(shuffle(delta_zigzag(np.ascontiguousarray(a))) for a in arrays)
+	if codec == ZLIB:
+		return zlib.compress(data, 6 if level is None else level)
+	if codec == LZMA:
+		return lzma.compress(data, preset=6 if level is None else level)
+	raise ValueError('Unknown codec %d' % codec)
+
+def decode(data, specs, codec=ZLIB):
+	'''
+	Decodes a block from encode(), specs giving the (rows, dtype, width) of
+	each array. Returns the list of arrays.
+	'''
+	if codec == ZLIB:
+		data = zlib.decompress(data)
+	elif codec == LZMA:
+		data = lzma.decompress(data)
+	elif codec != RAW:
+		raise ValueError('Unknown codec %d' % codec)
+
+	arrays = []
+	offset = 0
+	for n, dtype, width in specs:
+		size = n * width * np.dtype(dtype).itemsize
+		if codec == RAW:
+			arrays.append(np.frombuffer(data, dtype, n * width, offset).reshape(n, width))
+		else:
+			u = unshuffle(data, offset, n, dtype, width)
+			arrays.append(undelta_zigzag(u, np.dtype(dtype)))
+		offset += size
+	return arrays
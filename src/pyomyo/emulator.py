@@ -0,0 +1,367 @@
+'''
+BLED112 dongle emulator on a pseudo-terminal, POSIX only.
+
+DongleEmulator answers the BGAPI commands BT sends (discover, end_scan,
+connect, disconnect, read_attr, write_attr) for one or more virtual Myos and,
+once a Myo is told to stream, sends synthetic EMG, IMU, classifier and
+battery notifications at the configured rates. Any code taking a tty can be
+pointed at emulator.port, so connect time, throughput and recovery from
+jitter, stalls, dropped and corrupted frames can be measured without an
+armband.
+
+	with DongleEmulator(myos=2, jitter=0.01, drop=0.01) as e:
+		m = Myo(e.port, mode=emg_mode.RAW)
+		m.connect()
+		...
+		print(e.stats())
+'''
+
+import math
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from pyomyo.pyomyo import Framer, pack
+
+# Advertising data of a Myo, Myo.connect looks for it at the end of scan responses
+MYO_AD = b'\x06\x42\x48\x12\x4A\x7F\x2C\x48\x47\xB9\xDE\x04\xA9\x01\x00\x06\xD5'
+FIRMWARE = (1, 5, 1970, 2)
+RAW_EMG_HANDLES = (0x2b, 0x2e, 0x31, 0x34)
+
+def packet(typ, cls, cmd, payload=b''):
+	return pack('4B', typ, len(payload), cls, cmd) + payload
+
+def response(cls, cmd, payload=b''):
+	return packet(0x00, cls, cmd, payload)
+
+def event(cls, cmd, payload=b''):
+	return packet(0x80, cls, cmd, payload)
+
+def notification(conn, attr, data):
+	return event(4, 5, pack('BHBB', conn, attr, 1, len(data)) + data)
+
+
+class Stream(object):
+	'''One periodic notification of a virtual Myo.'''
+	def __init__(self, name, period, make):
+		self.name = name
+		self.period = period
+		self.make = make
+		self.next = None
+		self.count = 0
+
+
+class VirtualMyo(object):
+	'''The attributes, subscriptions and synthetic signals of one armband.'''
+	def __init__(self, addr, emg_rate=200, imu_rate=50, pose_period=2.0, battery_period=10.0):
+		self.addr = addr
+		self.conn = None
+		self.emg_rate = emg_rate
+		# Client characteristic configuration handles written with notifications on
+		self.subscribed = set()
+		self.emg_mode = 0
+		self.imu_mode = 0
+		self.classifier_mode = 0
+		self.battery = 100
+		self.emg_n = 0
+		self.imu_n = 0
+		self.pose = 0
+		self.streams = [
+			Stream('emg', 1 / 50, self.make_emg),
+			Stream('raw_emg', 2 / emg_rate, self.make_raw_emg),
+			Stream('imu', 1 / imu_rate, self.make_imu),
+			Stream('classifier', pose_period, self.make_classifier),
+			Stream('battery', battery_period, self.make_battery),
+		]
+
+	def attr(self, attr):
+		'''Value read from attr.'''
+		if attr == 0x17:
+			return pack('4H', *FIRMWARE)
+		if attr == 0x03:
+			return b'Emulated Myo'
+		if attr == 0x11:
+			return pack('B', self.battery)
+		return b''
+
+	def write(self, attr, val):
+		if attr == 0x19 and val[:2] == b'\x01\x03':
+			self.emg_mode, self.imu_mode, self.classifier_mode = val[2:5]
+		elif attr == 0x19 and val[:1] == b'\x04':
+			# Deep sleep
+			self.subscribed.clear()
+		elif val[:1] in (b'\x01', b'\x02'):
+			self.subscribed.add(attr)
+		else:
+			self.subscribed.discard(attr)
+
+	def enabled(self, s):
+		if s.name == 'emg':
+			return self.emg_mode == 1 and 0x28 in self.subscribed
+		if s.name == 'raw_emg':
+			return self.emg_mode in (2, 3) and bool(self.subscribed & {0x2c, 0x2f, 0x32, 0x35})
+		if s.name == 'imu':
+			return self.imu_mode != 0 and 0x1d in self.subscribed
+		if s.name == 'classifier':
+			return self.classifier_mode != 0 and 0x24 in self.subscribed
+		return 0x12 in self.subscribed
+
+	def emg_sample(self, scale):
+		t = self.emg_n / self.emg_rate
+		self.emg_n += 1
+		return [int(scale * math.sin(2 * math.pi * (5 + 3 * i) * t + i)) for i in range(8)]
+
+	def make_emg(self, s):
+		return [(0x27, pack('8HB', *[abs(v) for v in self.emg_sample(1000)], 0))]
+
+	def make_raw_emg(self, s):
+		attr = RAW_EMG_HANDLES[s.count % 4]
+		return [(attr, pack('16b', *(self.emg_sample(100) + self.emg_sample(100))))]
+
+	def make_imu(self, s):
+		a = self.imu_n / 100
+		self.imu_n += 1
+		quat = (int(16384 * math.cos(a)), int(16384 * math.sin(a)), 0, 0)
+		return [(0x1c, pack('10h', *quat, 0, 0, 2048, int(100 * math.sin(a)), 0, 0))]
+
+	def make_classifier(self, s):
+		if s.count == 0:
+			# Arm synced, right arm, towards the wrist
+			return [(0x23, pack('6B', 1, 1, 1, 0, 0, 0))]
+		self.pose = (self.pose + 1) % 6
+		return [(0x23, pack('6B', 3, self.pose, 0, 0, 0, 0))]
+
+	def make_battery(self, s):
+		if s.count:
+			self.battery = max(0, self.battery - 1)
+		return [(0x11, pack('B', self.battery))]
+
+
+class DongleEmulator(object):
+	'''
+	Emulates a BLED112 with up to 3 Myos in range on a pseudo-terminal.
+
+	The armbands stream at emg_rate (200 Hz in the raw modes, 50 Hz filtered)
+	and imu_rate. Faults are injected in the notifications only, never in the
+	command responses:
+		jitter: each notification is delayed by up to jitter seconds, order kept.
+		drop: probability of a notification being lost.
+		overrun: probability, per notification, of the dongle stalling for stall
+			seconds and then sending everything it held back at once.
+		garbage: probability of a few random bytes being sent before a notification.
+	Output the host does not read is buffered up to maxbuf bytes, beyond that
+	notifications are discarded and counted as overflowed, as a dongle would.
+	'''
+	def __init__(self, myos=1, emg_rate=200, imu_rate=50, jitter=0.0, drop=0.0, overrun=0.0, stall=0.05,
+			garbage=0.0, maxbuf=65536, scan_interval=0.1, seed=None):
+		if not 1 <= myos <= 3:
+			raise ValueError('The BLED112 supports 1 to 3 connections')
+		self.myos = [VirtualMyo([0x10 + i, 0x20, 0x30, 0x40, 0x50, 0x60], emg_rate, imu_rate) for i in range(myos)]
+		self.jitter = jitter
+		self.drop = drop
+		self.overrun = overrun
+		self.stall = stall
+		self.garbage = garbage
+		self.maxbuf = maxbuf
+		self.scan_interval = scan_interval
+		self.rng = random.Random(seed)
+
+		self.master, self.slave = os.openpty()
+		tty.setraw(self.slave)
+		os.set_blocking(self.master, False)
+		self.port = os.ttyname(self.slave)
+
+		self.framer = Framer()
+		# (release time, bytes) in sending order, and the bytes being written
+		self.pending = []
+		self.pending_bytes = 0
+		self.out = bytearray()
+		self.release = 0
+		self.stalled_until = 0
+		self.scanning = False
+		self.next_scan = 0
+		self.counters = dict.fromkeys(['commands', 'notifications', 'dropped', 'overflowed', 'stalls', 'garbage', 'bytes'], 0)
+
+		self.thread = None
+		self.running = False
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def start(self):
+		self.running = True
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.running = False
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+
+	def close(self):
+		self.stop()
+		os.close(self.master)
+		os.close(self.slave)
+
+	def stats(self):
+		stats = dict(self.counters)
+		stats['myos'] = [{'conn': m.conn, 'sent': {s.name: s.count for s in m.streams if s.count}} for m in self.myos]
+		return stats
+
+	def run(self):
+		while self.running:
+			now = time.monotonic()
+			wlist = [self.master] if self.out else []
+			r, w, _ = select.select([self.master], wlist, [], max(0.0, min(0.005, self.next_due() - now)))
+			if r:
+				self.read_commands()
+			now = time.monotonic()
+			self.generate(now)
+			self.flush(now)
+
+	# Host to dongle
+	def read_commands(self):
+		try:
+			data = os.read(self.master, 4096)
+		except (BlockingIOError, OSError):
+			return
+		for p in self.framer.feed(data):
+			self.counters['commands'] += 1
+			self.handle_command(p.cls, p.cmd, p.payload.tobytes())
+
+	def handle_command(self, cls, cmd, payload):
+		if (cls, cmd) == (6, 2):
+			self.send(response(6, 2, pack('H', 0)))
+			self.scanning = True
+			self.next_scan = time.monotonic()
+		elif (cls, cmd) == (6, 4):
+			self.scanning = False
+			self.send(response(6, 4, pack('H', 0)))
+		elif (cls, cmd) == (6, 3):
+			self.connect(list(payload[:6]))
+		elif (cls, cmd) == (3, 0):
+			self.disconnect(payload[0])
+		elif (cls, cmd) == (0, 6):
+			self.send(response(0, 6, pack('B', 3)))
+		elif (cls, cmd) in ((4, 4), (4, 5)):
+			conn, attr = struct.unpack_from('<BH', payload)
+			self.send(response(cls, cmd, pack('BH', conn, 0)))
+			m = self.connected(conn)
+			if m is None:
+				return
+			if cmd == 4:
+				val = m.attr(attr)
+				self.send(event(4, 5, pack('BHBB', conn, attr, 0, len(val)) + val))
+			else:
+				m.write(attr, payload[4:4 + payload[3]])
+				self.send(event(4, 1, pack('BHH', conn, 0, attr)))
+		else:
+			self.send(response(cls, cmd, pack('H', 0)))
+
+	def connected(self, conn):
+		for m in self.myos:
+			if m.conn == conn:
+				return m
+		return None
+
+	def connect(self, addr):
+		used = {m.conn for m in self.myos}
+		conn = min(set(range(3)) - used)
+		self.send(response(6, 3, pack('HB', 0, conn)))
+		for m in self.myos:
+			if m.addr == addr and m.conn is None:
+				m.conn = conn
+				self.send(event(3, 0, pack('BB6sBHHHB', conn, 5, bytes(addr), 0, 6, 64, 0, 0xff)))
+				return
+		# Nothing to connect to: like the dongle, the status event never comes
+
+	def disconnect(self, conn):
+		self.send(response(3, 0, pack('BH', conn, 0)))
+		m = self.connected(conn)
+		if m is not None:
+			m.conn = None
+			m.subscribed.clear()
+			m.emg_mode = m.imu_mode = m.classifier_mode = 0
+			for s in m.streams:
+				s.next = None
+			self.send(event(3, 4, pack('BH', conn, 0x16)))
+
+	# Dongle to host
+	def send(self, data):
+		'''Queues a command response or event, sent after anything pending.'''
+		self.pending.append((self.release, data))
+		self.pending_bytes += len(data)
+
+	def next_due(self):
+		due = [max(self.pending[0][0], self.stalled_until)] if self.pending else []
+		if self.scanning:
+			due.append(self.next_scan)
+		for m in self.myos:
+			due.extend(s.next for s in m.streams if s.next is not None)
+		return min(due) if due else time.monotonic() + 0.005
+
+	def generate(self, now):
+		if self.scanning and now >= self.next_scan:
+			self.next_scan = now + self.scan_interval
+			for m in self.myos:
+				if m.conn is None:
+					self.send(event(6, 0, pack('bB6sBBB', -60, 0, bytes(m.addr), 0, 0xff, len(MYO_AD)) + MYO_AD))
+
+		for m in self.myos:
+			if m.conn is None:
+				continue
+			for s in m.streams:
+				if not m.enabled(s):
+					s.next = None
+					continue
+				if s.next is None:
+					s.next = now
+				while s.next <= now:
+					for attr, data in s.make(s):
+						self.notify(s.next, notification(m.conn, attr, data))
+					s.count += 1
+					s.next += s.period
+
+	def notify(self, t, data):
+		rng = self.rng
+		if self.drop and rng.random() < self.drop:
+			self.counters['dropped'] += 1
+			return
+		if len(self.out) + self.pending_bytes > self.maxbuf:
+			self.counters['overflowed'] += 1
+			return
+		if self.overrun and rng.random() < self.overrun:
+			self.stalled_until = max(self.stalled_until, t + self.stall)
+			self.counters['stalls'] += 1
+		if self.garbage and rng.random() < self.garbage:
+			self.counters['garbage'] += 1
+			self.send(bytes(rng.getrandbits(8) for _ in range(rng.randint(1, 8))))
+		# Delays keep the sending order, so a late packet holds back the next ones
+		self.release = max(self.release, t + rng.uniform(0, self.jitter))
+		self.send(data)
+		self.counters['notifications'] += 1
+
+	def flush(self, now):
+		if now >= self.stalled_until:
+			i = 0
+			while i < len(self.pending) and self.pending[i][0] <= now:
+				self.out += self.pending[i][1]
+				self.pending_bytes -= len(self.pending[i][1])
+				i += 1
+			del self.pending[:i]
+		if self.out:
+			try:
+				n = os.write(self.master, self.out)
+			except (BlockingIOError, OSError):
+				return
+			del self.out[:n]
+			self.counters['bytes'] += n
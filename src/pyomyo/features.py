@@ -0,0 +1,163 @@
+'''
+Time domain EMG features over sliding windows.
+
+For every channel, over the last window samples: mean absolute value (mav),
+root mean square (rms), waveform length (wl), zero crossings (zc), slope sign
+changes (ssc) and the Hjorth activity, mobility and complexity. Each feature
+is a function of running sums of per sample terms, such as |x|, x**2 or
+|x - previous x|, so FeatureExtractor.update() adds the terms of the new
+sample and removes those of the sample leaving the window, O(channels) per
+sample whatever the window. windows() computes the same features for every
+window of a whole array at once, from cumulative sums.
+
+	fx = FeatureExtractor(window=40)
+	def on_emg(emg, moving):
+		y = cls.classify(fx.update(emg))
+
+	cls.train(*training_windows(X, Y, window=40))
+
+Differences reach one sample before the window, and second differences and
+slope sign changes two, so every feature of a window of window samples sees
+window differences. A feature vector holds each feature of every channel,
+feature by feature.
+'''
+
+import numpy as np
+
+FEATURES = ('mav', 'rms', 'wl', 'zc', 'ssc', 'activity', 'mobility', 'complexity')
+# Per sample terms summed over the window
+TERMS = ('abs', 'square', 'wl', 'zc', 'ssc', 'x', 'd', 'd2', 'dd', 'dd2')
+
+def terms(x, p1, p2, threshold=0):
+	'''
+	Terms of samples x, given the samples p1 one and p2 two before them, as
+	a (..., len(TERMS), channels) array.
+	'''
+	x, p1, p2 = (np.asarray(a, np.float64) for a in (x, p1, p2))
+	d = x - p1
+	d1 = p1 - p2
+	dd = d - d1
+	ad = np.abs(d)
+	zc = (x * p1 < 0) & (ad >= threshold)
+	ssc = (d1 * -d > 0) & (np.maximum(np.abs(d1), ad) >= threshold)
+	return np.stack((np.abs(x), x * x, ad, zc, ssc, x, d, d * d, dd, dd * dd), axis=-2)
+
+def divide(a, b):
+	return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b > 0)
+
+def from_sums(sums, window, features=FEATURES):
+	'''Features from the window sums of the terms, flattened feature by feature.'''
+	s = dict(zip(TERMS, np.moveaxis(sums, -2, 0)))
+	out = {}
+	out['mav'] = s['abs'] / window
+	out['rms'] = np.sqrt(s['square'] / window)
+	out['wl'] = s['wl']
+	out['zc'] = s['zc']
+	out['ssc'] = s['ssc']
+	if 'activity' in features or 'mobility' in features or 'complexity' in features:
+		var0 = np.maximum(s['square'] / window - (s['x'] / window) ** 2, 0)
+		var1 = np.maximum(s['d2'] / window - (s['d'] / window) ** 2, 0)
+		var2 = np.maximum(s['dd2'] / window - (s['dd'] / window) ** 2, 0)
+		out['activity'] = var0
+		out['mobility'] = np.sqrt(divide(var1, var0))
+		out['complexity'] = divide(np.sqrt(divide(var2, var1)), out['mobility'])
+	return np.concatenate([out[f] for f in features], axis=-1)
+
+
+class FeatureExtractor(object):
+	'''
+	Features of the last window samples of a stream, updated sample by
+	sample. A ring keeps the terms of the samples in the window, and their
+	sums are resynchronised with it once per turn of the ring so rounding
+	errors never build up. The features are partial until ready, after
+	window + 2 samples.
+	'''
+	def __init__(self, window=40, channels=8, threshold=0, features=FEATURES):
+		self.window = window
+		self.channels = channels
+		self.threshold = threshold
+		self.features = tuple(features)
+		self.reset()
+
+	def reset(self):
+		self.ring = np.zeros((self.window, len(TERMS), self.channels))
+		self.sums = np.zeros((len(TERMS), self.channels))
+		self.head = 0
+		# The last two samples, latest first
+		self.prev = np.zeros((2, self.channels))
+		self.count = 0
+
+	@property
+	def ready(self):
+		return self.count >= self.window + 2
+
+	def update(self, x):
+		'''Adds the sample x, returns the features of the window ending with it.'''
+		x = np.asarray(x, np.float64)
+		t = terms(x, self.prev[0], self.prev[1], self.threshold)
+		self.sums += t - self.ring[self.head]
+		self.ring[self.head] = t
+		self.head += 1
+		if self.head == self.window:
+			self.head = 0
+			self.sums = self.ring.sum(axis=0)
+		self.prev[1] = self.prev[0]
+		self.prev[0] = x
+		self.count += 1
+		return from_sums(self.sums, self.window, self.features)
+
+	def extend(self, block):
+		'''update() of every sample of block at once, returns their features.'''
+		block = np.asarray(block, np.float64).reshape(-1, self.channels)
+		m = len(block)
+		if m == 0:
+			return np.empty((0, len(self.features) * self.channels))
+		samples = np.concatenate((self.prev[::-1], block))
+		t = terms(samples[2:], samples[1:-1], samples[:-2], self.threshold)
+		rows = np.concatenate((np.roll(self.ring, -self.head, axis=0), t))
+		cum = np.zeros((len(rows) + 1,) + rows.shape[1:])
+		np.cumsum(rows, axis=0, out=cum[1:])
+		sums = cum[self.window + 1:] - cum[1:m + 1]
+
+		self.ring = np.ascontiguousarray(rows[-self.window:])
+		self.head = 0
+		self.sums = self.ring.sum(axis=0)
+		self.prev = np.ascontiguousarray(samples[:-3:-1])
+		self.count += m
+		return from_sums(sums, self.window, self.features)
+
+
+def windows(emg, window=40, step=1, threshold=0, features=FEATURES, chunk=1 << 16):
+	'''
+	Features of the windows of window samples of the n x channels array emg
+	ending every step samples, from the first whole one, the window ending
+	at sample window + 1. Samples are taken chunk at a time to bound memory.
+	'''
+	emg = np.asarray(emg)
+	if len(emg) < window + 2:
+		return np.empty((0, len(features) * emg.shape[1]))
+	fx = FeatureExtractor(window, emg.shape[1], threshold, features)
+	out = []
+	for i in range(0, len(emg), chunk):
+		F = fx.extend(emg[i:i + chunk])
+		# Windows wanted end at samples window + 1 + k * step, the first in this chunk at k
+		k = max(-(-(i - window - 1) // step), 0)
+		out.append(F[window + 1 + k * step - i::step])
+	return np.concatenate(out)
+
+def training_windows(X, Y, window=40, step=1, threshold=0, features=FEATURES):
+	'''
+	(features, labels) of the windows of the samples X whose samples, and
+	the two before, all have the same label in Y, ready for
+	Live_Classifier.train().
+	'''
+	X = np.asarray(X)
+	Y = np.asarray(Y)
+	if len(X) < window + 2:
+		return np.empty((0, len(features) * X.shape[1])), np.empty(0, Y.dtype)
+	F = windows(X, window, 1, threshold, features)
+	# Number of label changes up to each sample, equal at both ends of a window of one label
+	changes = np.concatenate(([0], np.cumsum(Y[1:] != Y[:-1])))
+	ends = np.arange(window + 1, len(X))
+	keep = (changes[ends] == changes[ends - window - 1]) & ((ends - window - 1) % step == 0)
+	return F[keep], Y[ends[keep]]
@@ -0,0 +1,83 @@
+'''
+Streaming IIR filters for EMG and IMU.
+
+A FilterBank runs a chain of low-pass, high-pass, band-pass, band-stop and
+notch filters over every channel of a stream, causally and keeping the
+filter state between calls, so each sample is filtered once, as it arrives,
+in constant time. Filters are designed as second order sections, which stay
+stable at cutoffs far below the sampling rate, and designs are cached, so
+any number of banks with the same filters design them once.
+
+	emg = FilterBank(8, 200, [('bandpass', (20, 90)), ('notch', 50)])
+	imu = FilterBank(10, 50, [('lowpass', 2)])
+	def on_emg_block(block, times):
+		filtered = emg.filter(block)
+'''
+
+import functools
+
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, tf2sos
+
+KINDS = ('lowpass', 'highpass', 'bandpass', 'bandstop', 'notch')
+
+@functools.lru_cache(maxsize=None)
+def design(kind, freq, fs, order=4):
+	'''
+	Second order sections of a Butterworth filter of the given kind, order
+	and cutoff freq in Hz, a (low, high) pair for bandpass and bandstop, at
+	the sampling rate fs. For notch, freq is the frequency removed and order
+	the quality factor. The sections are shared, so read only.
+	'''
+	if kind == 'notch':
+		sos = tf2sos(*iirnotch(freq, order, fs=fs))
+	elif kind in KINDS:
+		sos = butter(order, freq, btype=kind, fs=fs, output='sos')
+	else:
+		raise ValueError('Unknown filter %s, not one of %s' % (kind, ', '.join(KINDS)))
+	sos.flags.writeable = False
+	return sos
+
+
+class FilterBank(object):
+	'''
+	The filters of stages, applied one after the other to each of channels
+	channels sampled at fs.
+
+	A stage is (kind, freq) or (kind, freq, order), see design(), the order
+	defaulting to 4 and the quality factor of notches to 30. The state
+	starts as if the first sample had always been there, so the output
+	starts without a step, unless initial is zero.
+	'''
+	def __init__(self, channels, fs, stages, initial='first'):
+		self.channels = channels
+		self.fs = fs
+		self.stages = [tuple(s) for s in stages]
+		sections = []
+		for stage in self.stages:
+			kind, freq = stage[:2]
+			order = stage[2] if len(stage) > 2 else (30 if kind == 'notch' else 4)
+			sections.append(design(kind, tuple(freq) if np.ndim(freq) else freq, fs, order))
+		self.sos = np.concatenate(sections)
+		self.initial = initial
+		self.reset()
+
+	def reset(self):
+		'''Forgets the past samples.'''
+		self.zi = None
+
+	def filter(self, block):
+		'''Filters the n x channels block of the next samples, returns the output.'''
+		block = np.asarray(block, np.float64).reshape(-1, self.channels)
+		if len(block) == 0:
+			return block
+		if self.zi is None:
+			# zi holds the state of each section for each channel, sections x 2 x channels
+			self.zi = np.repeat(sosfilt_zi(self.sos)[:, :, None], self.channels, axis=2)
+			self.zi *= 0 if self.initial == 'zero' else block[0]
+		out, self.zi = sosfilt(self.sos, block, axis=0, zi=self.zi)
+		return out
+
+	def update(self, sample):
+		'''Filters one sample, returns the output.'''
+		return self.filter(sample)[0]
@@ -0,0 +1,195 @@
+'''
+Conversion of the text and spreadsheet recordings of the older tools.
+
+Handles the tab or comma separated files with a Timestamp column in seconds
+and Quat_w ... Gyro_z IMU columns (myo_data_exp_quieto.txt, Help_csvData.py,
+DataCollector.py), Recognice_All.py CSVs holding the quaternion, accelerometer
+and gyroscope as tuples, and EMG CSVs with Channel_1 ... Channel_8 columns
+and no times (data_collector.py). Extra columns, such as derived values, are
+ignored. Files are parsed in blocks of rows by NumPy, never whole, into the
+chunked binary format of pyomyo.recording.
+
+	r = load('myo_data_exp_quieto.txt')
+	times, imu = r.read('imu')
+
+load() converts on first use and afterwards just maps the converted file.
+Many files convert in parallel with convert_many(), or from a shell:
+
+	python -m pyomyo.legacy *.txt *.csv
+'''
+
+import csv
+import datetime
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+from pyomyo.pyomyo import emg_mode
+from pyomyo.recording import Recording, RecordingWriter
+
+IMU_COLUMNS = ['Quat_w', 'Quat_x', 'Quat_y', 'Quat_z', 'Acc_x', 'Acc_y', 'Acc_z', 'Gyro_x', 'Gyro_y', 'Gyro_z']
+EMG_COLUMNS = ['Channel_%d' % i for i in range(1, 9)]
+# Recognice_All.py columns holding tuples, and their IMU columns
+TUPLE_COLUMNS = {
+	'Quaternion': IMU_COLUMNS[0:4],
+	'Accelerometer': IMU_COLUMNS[4:7],
+	'Gyroscope': IMU_COLUMNS[7:10],
+}
+# Parentheses and quotes around tuples, removed so their items become columns
+TUPLE_CHARS = str.maketrans('', '', '()"\'')
+
+def expand_columns(names):
+	'''Column names once the tuples are split into one column per item.'''
+	columns = []
+	for name in names:
+		columns.extend(TUPLE_COLUMNS.get(name, [name]))
+	return columns
+
+def layout(columns):
+	'''
+	Index of the time column, or None, and the (stream, column indices)
+	present, taking the first column of a repeated name.
+	'''
+	columns = [c.strip() for c in columns]
+	time_col = columns.index('Timestamp') if 'Timestamp' in columns else None
+	streams = []
+	for stream, names in (('imu', IMU_COLUMNS), ('emg', EMG_COLUMNS)):
+		if all(n in columns for n in names):
+			streams.append((stream, [columns.index(n) for n in names]))
+	if not streams:
+		raise ValueError('No IMU or EMG columns in %s' % columns)
+	return time_col, streams
+
+def to_seconds(value):
+	'''A time cell in seconds, datetimes and ISO strings included.'''
+	if isinstance(value, datetime.datetime):
+		return value.timestamp()
+	try:
+		return float(value)
+	except ValueError:
+		return datetime.datetime.fromisoformat(value.strip()).timestamp()
+
+
+class Converter(object):
+	'''Writes blocks of parsed rows of one file to a recording.'''
+	def __init__(self, columns, writer, emg_rate):
+		self.time_col, self.streams = layout(columns)
+		self.usecols = ([self.time_col] if self.time_col is not None else []) + [c for _, cols in self.streams for c in cols]
+		self.writer = writer
+		self.period = 1e9 / emg_rate
+		self.rows = 0
+
+	def write(self, block):
+		'''block holds the usecols columns of a block of rows, in that order.'''
+		n = len(block)
+		if n == 0:
+			return
+		if self.time_col is not None:
+			times = np.rint(block[:, 0] * 1e9).astype(np.int64)
+			i = 1
+		else:
+			times = np.rint((self.rows + np.arange(n)) * self.period).astype(np.int64)
+			i = 0
+		for stream, cols in self.streams:
+			self.writer.write(stream, times, np.rint(block[:, i:i + len(cols)]))
+			i += len(cols)
+		self.rows += n
+
+
+def convert_text(path, writer, emg_rate, chunk):
+	with open(path, newline='') as f:
+		header = f.readline()
+		delimiter = '\t' if '\t' in header else ','
+		names = next(csv.reader([header], delimiter=delimiter))
+		tuples = any(n.strip() in TUPLE_COLUMNS for n in names)
+		conv = Converter(expand_columns(names), writer, emg_rate)
+
+		converters = None
+		while True:
+			lines = list(itertools.islice(f, chunk))
+			if not lines:
+				break
+			text = ''.join(lines)
+			if tuples:
+				text = text.translate(TUPLE_CHARS)
+			if converters is None and conv.time_col is not None:
+				# Times written as dates need parsing, plain seconds don't
+				first = lines[0].translate(TUPLE_CHARS).split(delimiter)[conv.time_col]
+				try:
+					float(first)
+					converters = {}
+				except ValueError:
+					converters = {conv.time_col: to_seconds}
+			block = np.loadtxt(io.StringIO(text), delimiter=delimiter, usecols=conv.usecols,
+				converters=converters or None, ndmin=2)
+			conv.write(block)
+	return conv.rows
+
+def convert_xlsx(path, writer, emg_rate, chunk):
+	try:
+		import openpyxl
+	except ImportError:
+		raise ImportError('Reading .xlsx recordings needs openpyxl, pip install openpyxl')
+
+	wb = openpyxl.load_workbook(path, read_only=True)
+	try:
+		rows = wb.active.iter_rows(values_only=True)
+		names = [str(n) for n in next(rows)]
+		conv = Converter(names, writer, emg_rate)
+		while True:
+			block = list(itertools.islice(rows, chunk))
+			if not block:
+				break
+			if conv.time_col is not None:
+				block = [list(r) for r in block]
+				for r in block:
+					r[conv.time_col] = to_seconds(r[conv.time_col])
+			conv.write(np.array([[r[c] for c in conv.usecols] for r in block], dtype=np.float64))
+	finally:
+		wb.close()
+	return conv.rows
+
+def convert(path, out=None, mode=emg_mode.PREPROCESSED, emg_rate=50, chunk=1 << 20, codec='raw'):
+	'''
+	Converts the legacy recording path to out, path + '.myo' by default, and
+	returns out. mode sets the EMG type, emg_rate the sampling rate assumed
+	for EMG files without times. Rows are parsed chunk at a time, and each
+	chunk of rows becomes one chunk of the recording, compressed with codec.
+	'''
+	if out is None:
+		out = path + '.myo'
+	meta = {'source': os.path.basename(path)}
+	# Written aside so a failed conversion never passes for a finished one
+	tmp = out + '.tmp'
+	with RecordingWriter(tmp, mode, meta=meta, codec=codec) as writer:
+		if path.lower().endswith('.xlsx'):
+			convert_xlsx(path, writer, emg_rate, chunk)
+		else:
+			convert_text(path, writer, emg_rate, chunk)
+	os.replace(tmp, out)
+	return out
+
+def convert_many(paths, processes=None, **kwargs):
+	'''Converts every file in paths in a pool of processes, returns the outputs.'''
+	with multiprocessing.Pool(processes) as pool:
+		return pool.map(functools.partial(convert, **kwargs), paths)
+
+def load(path, **kwargs):
+	'''
+	Opens the legacy recording path as a Recording, converting it first unless
+	an up to date conversion exists. kwargs are passed to convert().
+	'''
+	out = path + '.myo'
+	if not os.path.exists(out) or os.path.getmtime(out) < os.path.getmtime(path):
+		convert(path, out, **kwargs)
+	return Recording(out)
+
+
+if __name__ == '__main__':
+	for out in convert_many(sys.argv[1:]):
+		print(out)
@@ -0,0 +1,241 @@
+'''
+Parallel acquisition from several BLED112 dongles.
+
+MyoCoordinator connects one or more Myos through every dongle plugged in,
+runs one reader thread per dongle and merges the samples of all the armbands
+into a single stream ordered by their time.monotonic_ns() sampling time, which
+all the threads share.
+
+	with MyoCoordinator(mode=emg_mode.RAW) as c:
+		for t, device, kind, values in c:
+			...
+		print(c.stats())
+'''
+
+import collections
+import threading
+import time
+
+from pyomyo.pyomyo import MyoHub, detect_ttys, emg_mode
+
+class Device(object):
+	'''One armband in the coordinator, with its reorder buffer and counters.'''
+	def __init__(self, index, tty, hub, myo, maxlen):
+		self.index = index
+		self.tty = tty
+		self.hub = hub
+		self.myo = myo
+		self.buf = collections.deque()
+		self.maxlen = maxlen
+		# Time of the last sample queued, by kind
+		self.queued = {}
+		# Set once its reader thread has ended, with the exception it died of
+		self.finished = False
+		self.error = None
+		self.received = 0
+		self.dropped = 0
+		self.delivered = 0
+		self.latency_sum = 0
+		self.latency_max = 0
+
+
+class MyoCoordinator(object):
+	'''
+	Streams every armband of every dongle into one time-ordered stream.
+
+	Each device has a bounded reorder buffer. A sample is released once every
+	device has delivered a later sample, as the sample times of each stream
+	only increase, or once it is older than delay seconds, so a stalled dongle
+	holds the stream back by at most delay.
+	When a buffer is full its oldest sample is dropped and counted.
+
+	A reader thread that dies finishes the devices of its dongle, which stop
+	holding the others back. get() raises its exception once their buffered
+	samples are released, and the other devices keep streaming.
+	'''
+	def __init__(self, ttys=None, mode=emg_mode.PREPROCESSED, per_dongle=1, delay=0.05, maxlen=2048, timeout=0.02):
+		if ttys is None:
+			ttys = detect_ttys()
+		if not ttys:
+			raise ValueError('Myo dongle not found!')
+
+		self.ttys = ttys
+		self.mode = mode
+		self.per_dongle = per_dongle
+		self.delay = int(delay * 1e9)
+		self.maxlen = maxlen
+		self.timeout = timeout
+		self.hubs = []
+		self.devices = []
+		self.cond = threading.Condition()
+		self.threads = []
+		# (devices, exception) of the reader threads that died, not raised yet
+		self.errors = []
+		self.running = False
+		self.started = None
+
+	def connect(self, addrs=None):
+		'''
+		Connects per_dongle Myos through each dongle, one dongle after the
+		other so two of them never scan for the same armband. addrs optionally
+		gives the list of MAC addresses to connect through each dongle.
+		'''
+		for i, tty in enumerate(self.ttys):
+			hub = MyoHub(tty)
+			self.hubs.append(hub)
+			dongle_addrs = addrs[i] if addrs is not None else [None] * self.per_dongle
+			for addr in dongle_addrs:
+				m = hub.add_myo(addr, mode=self.mode)
+				d = Device(len(self.devices), tty, hub, m, self.maxlen)
+				self.devices.append(d)
+				m.add_emg_handler(lambda emg, moving, d=d: self.put(d, d.myo.emg_time, 'emg', emg))
+				m.add_imu_handler(lambda quat, acc, gyro, d=d: self.put(d, d.myo.imu_time, 'imu', (quat, acc, gyro)))
+
+	def __enter__(self):
+		if not self.devices:
+			self.connect()
+		self.start()
+		return self
+
+	def __exit__(self, *args):
+		self.stop()
+
+	def __iter__(self):
+		while True:
+			item = self.get()
+			if item is None:
+				return
+			yield item
+
+	def start(self):
+		self.running = True
+		self.started = time.monotonic_ns()
+		for hub in self.hubs:
+			hub.bt.ser.timeout = self.timeout
+			t = threading.Thread(target=self.read, args=(hub,), daemon=True)
+			t.start()
+			self.threads.append(t)
+
+	def stop(self):
+		with self.cond:
+			self.running = False
+			self.cond.notify_all()
+		for t in self.threads:
+			t.join()
+		self.threads = []
+
+	def disconnect(self):
+		for hub in self.hubs:
+			hub.disconnect()
+
+	def read(self, hub):
+		error = None
+		try:
+			while self.running:
+				hub.run()
+				with self.cond:
+					self.cond.notify_all()
+		except Exception as e:
+			error = e
+		with self.cond:
+			devices = [d for d in self.devices if d.hub is hub]
+			for d in devices:
+				d.finished = True
+				d.error = error
+			if error is not None:
+				self.errors.append((devices, error))
+			self.cond.notify_all()
+
+	def put(self, d, t, kind, values):
+		with self.cond:
+			if len(d.buf) >= d.maxlen:
+				d.buf.popleft()
+				d.dropped += 1
+			# EMG and IMU times can interleave, keep the buffer sorted
+			i = len(d.buf)
+			while i and d.buf[i - 1][0] > t:
+				i -= 1
+			d.buf.insert(i, (t, d.index, kind, values))
+			d.queued[kind] = t
+			d.received += 1
+
+	def pop_ready(self):
+		'''Returns the oldest sample that can be released, or None.'''
+		first = None
+		for d in self.devices:
+			if d.buf and (first is None or d.buf[0][0] < first.buf[0][0]):
+				first = d
+		if first is None:
+			return None
+
+		now = time.monotonic_ns()
+		# Finished devices queue no more samples
+		horizons = [self.horizon(d) for d in self.devices if not d.finished]
+		watermark = max(min(horizons), now - self.delay) if horizons else now
+		if first.buf[0][0] > watermark and self.running:
+			return None
+
+		item = first.buf.popleft()
+		latency = now - item[0]
+		first.delivered += 1
+		first.latency_sum += latency
+		first.latency_max = max(first.latency_max, latency)
+		return item
+
+	def horizon(self, d):
+		'''Every sample of d up to this time has been queued.'''
+		return min(d.queued.values()) if d.queued else 0
+
+	def get(self, timeout=None):
+		'''
+		Returns the next (t, device, kind, values) sample in time order,
+		waiting up to timeout seconds for one. Returns None on timeout, or once
+		the coordinator is stopped, or every reader has ended, and drained.
+		Raises the exception a reader thread died of once the samples of its
+		devices are released.
+		'''
+		deadline = None if timeout is None else time.monotonic() + timeout
+		with self.cond:
+			while True:
+				for i, (devices, error) in enumerate(self.errors):
+					if not any(d.buf for d in devices):
+						del self.errors[i]
+						raise error
+				item = self.pop_ready()
+				if item is not None:
+					return item
+				done = not self.running or all(d.finished for d in self.devices)
+				if done and not any(d.buf for d in self.devices):
+					return None
+				wait = self.delay / 1e9
+				if deadline is not None:
+					wait = min(wait, deadline - time.monotonic())
+					if wait <= 0:
+						return None
+				self.cond.wait(wait)
+
+	def stats(self):
+		'''
+		Per device counters, latencies are from sampling to release in seconds.
+		Losses are counted where they happen: lost are EMG and IMU samples that
+		never arrived over the radio, confirmed by the sample clocks of the
+		Myo, dropped are samples that arrived but were cut from a full reorder
+		buffer, and skipped_bytes are bytes of garbage the framer of the dongle
+		skipped, shared by every device on it.
+		'''
+		elapsed = (time.monotonic_ns() - self.started) / 1e9 if self.started else 0
+		stats = []
+		for d in self.devices:
+			stats.append({
+				'tty': d.tty,
+				'conn': d.myo.conn,
+				'received': d.received,
+				'rate': d.received / elapsed if elapsed else 0.0,
+				'lost': d.myo.emg_clock.lost + d.myo.imu_clock.lost,
+				'dropped': d.dropped,
+				'skipped_bytes': d.myo.bt.framer.skipped,
+				'mean_latency': d.latency_sum / d.delivered / 1e9 if d.delivered else 0.0,
+				'max_latency': d.latency_max / 1e9,
+				'error': d.error,
+			})
+		return stats
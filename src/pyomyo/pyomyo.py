@@ -41,7 +41,9 @@ know that any function called on Myo_Raw, may try to use the serial port,
 in windows if this is tried from a seperate thread you will get a permission error
 '''
 
+import collections
 import enum
+import math
 import os
 import re
 import struct
@@ -49,6 +51,7 @@ import sys
 import threading
 import time
 
+import numpy as np
 import serial
 from serial.tools.list_ports import comports
 
@@ -71,6 +74,14 @@ def multiord(b):
 	else:
 		return map(ord, b)
 
+# Precompiled decoders for the attribute notifications
+ATTR_HEADER = struct.Struct('<BHB')
+EMG_STRUCT = struct.Struct('<8HB')
+RAW_EMG_STRUCT = struct.Struct('<16b')
+IMU_STRUCT = struct.Struct('<10h')
+CLASSIFIER_STRUCT = struct.Struct('<6B')
+BATTERY_STRUCT = struct.Struct('<B')
+
 class emg_mode(enum.Enum):
 	NO_DATA = 0 # Do not send EMG data
 	PREPROCESSED = 1 # Sends 50Hz rectified and band pass filtered data
@@ -99,12 +110,36 @@ class Pose(enum.Enum):
 	UNKNOWN = 255
 
 
+def detect_ttys():
+	'''Returns the serial ports of all the BLED112 dongles plugged in.'''
+	return [p[0] for p in comports() if re.search(r'PID=2458:0*1', p[2])]
+
+
 class Packet(object):
-	def __init__(self, ords):
+	'''
+	A single BLED112 packet.
+
+	When built by a Framer the payload is a memoryview into its receive
+	buffer, so slicing and unpacking it does not copy. The view is only valid
+	until the next read from the serial port, that is for the duration of the
+	handler calls for that read. Handlers that keep packets around must store
+	p.copy() instead.
+	'''
+	__slots__ = ('typ', 'cls', 'cmd', 'payload', 't')
+
+	def __init__(self, ords, t=None):
+		if isinstance(ords, list):
+			ords = multichr(ords)
 		self.typ = ords[0]
 		self.cls = ords[2]
 		self.cmd = ords[3]
-		self.payload = multichr(ords[4:])
+		self.payload = memoryview(ords)[4:]
+		# time.monotonic_ns() when the packet was read from the port
+		self.t = t
+
+	def copy(self):
+		'''Returns a packet owning its own copy of the payload.'''
+		return Packet(bytes((self.typ, len(self.payload) & 0xFF, self.cls, self.cmd)) + self.payload.tobytes(), self.t)
 
 	def __repr__(self):
 		return 'Packet(%02X, %02X, %02X, [%s])' % \
@@ -112,51 +147,311 @@ class Packet(object):
 			 ' '.join('%02X' % b for b in multiord(self.payload)))
 
 
+class Framer(object):
+	'''
+	Splits the byte stream coming from the BLED112 into packets.
+
+	Bytes are copied into a reusable buffer, every complete packet found is
+	returned in one pass and a trailing partial frame is kept for the next call.
+	'''
+	HEADERS = (0x00, 0x80, 0x08, 0x88) # [BLE response pkt, BLE event pkt, wifi response pkt, wifi event pkt]
+
+	def __init__(self, size=4096):
+		self.buf = bytearray(size)
+		self.view = memoryview(self.buf)
+		self.start = 0
+		self.end = 0
+		# Bytes discarded while out of sync, e.g. after an input overrun
+		self.skipped = 0
+
+	def feed(self, data, t=None):
+		'''Adds data read at time t and returns the complete packets, stamped with t.'''
+		n = len(data)
+		pending = self.end - self.start
+		if self.start:
+			# Move the partial frame to the front of the buffer
+			self.view[:pending] = self.view[self.start:self.end]
+			self.start, self.end = 0, pending
+		if self.end + n > len(self.buf):
+			# Grow into a new buffer rather than resizing the old one
+			buf = bytearray(max(2 * len(self.buf), self.end + n))
+			buf[:self.end] = self.view[:self.end]
+			self.buf = buf
+			self.view = memoryview(buf)
+		self.view[self.end:self.end + n] = data
+		self.end += n
+		return self.parse(t)
+
+	def parse(self, t=None):
+		buf = self.buf
+		pos = self.start
+		end = self.end
+		packets = []
+		while pos < end:
+			if buf[pos] not in self.HEADERS:
+				# Out of sync, skip until the start of a packet
+				pos += 1
+				self.skipped += 1
+				continue
+			if end - pos < 2:
+				break
+			packet_len = 4 + (buf[pos] & 0x07) + buf[pos + 1]
+			if end - pos < packet_len:
+				break
+			packets.append(Packet(self.view[pos:pos + packet_len], t))
+			pos += packet_len
+
+		if pos == end:
+			self.start = self.end = 0
+		else:
+			self.start = pos
+		return packets
+
+
+class SampleClock(object):
+	'''
+	Reconstructs the sampling time and index of every sample of a stream sent
+	at a nominal rate, from the arrival times of the packets carrying them.
+
+	Arrival times are the sampling times plus a delay that is never negative.
+	The period is refit from the arrivals with an exponentially weighted least
+	squares line, which corrects the drift between the armband and host clocks,
+	and the phase follows the lower envelope of the arrivals: it moves down at
+	once when a packet arrives earlier than predicted and creeps up by alpha of
+	the delay otherwise.
+
+	A packet arriving half a packet or more late is either held up, the
+	backlog of a stall arriving in a burst and draining back to the usual
+	delay, or comes after lost packets, which leave every later packet just
+	as late. Late packets are kept on the nominal grid, one period apart,
+	until that is settled, and the packets missing, counted from the
+	smallest delay seen meanwhile, are then lost, their indices are skipped
+	and counted in lost. It is settled as soon as enough packets in a row
+	arrive late by the same amount, within a quarter of a packet, which a
+	draining burst never does: two on a steady link, more the more often
+	jitter alone makes packets late, see run_length. Otherwise once arrivals
+	have stayed late for confirm seconds.
+
+	The times of a stream always increase, t being the time of the last sample.
+	'''
+	def __init__(self, rate, confirm=0.5, alpha=0.01, forget=1e-4):
+		self.nominal = 1e9 / rate
+		self.period = self.nominal
+		self.confirm = int(confirm * 1e9)
+		self.alpha = alpha
+		self.forget = 1.0 - forget
+		# Index and time of the last sample
+		self.index = -1
+		self.t = None
+		self.lost = 0
+		# Arrival time of the first of the packets late since, their smallest and largest delay and number
+		self.late_since = None
+		self.late_min = self.late_max = 0
+		self.late_n = 0
+		# Moving fraction of packets late without packets being lost, starts
+		# high so the jitter of the link is learnt before settling early
+		self.late_rate = 0.5
+		self.t_ref = None
+		self.updates = 0
+		self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+
+	def update(self, t, n=1):
+		'''
+		Registers a packet of n samples that arrived at t, in nanoseconds.
+		Returns the index and time of its first sample, the next ones being
+		one period apart.
+		'''
+		period = self.period
+		if self.t is None:
+			self.t_ref = t
+			pred = t
+		else:
+			pred = self.t + n * period
+			late = t - pred
+			if late >= 0.5 * n * period:
+				if self.late_since is None:
+					self.late_since = t
+					self.late_min = self.late_max = late
+					self.late_n = 1
+				else:
+					self.late_min = min(self.late_min, late)
+					self.late_max = max(self.late_max, late)
+					self.late_n += 1
+				steady = self.late_n >= self.run_length() and self.late_max - self.late_min < 0.25 * n * period
+				if steady or t - self.late_since >= self.confirm:
+					# Steadily late, or late long after any burst would have drained, packets went missing
+					skip = int(self.late_min / (n * period) + 0.5) * n
+					self.index += skip
+					self.lost += skip
+					pred += skip * period
+					self.late_since = None
+			else:
+				if self.late_since is not None:
+					# Late packets that caught up, jitter or a burst
+					self.late_rate = min(self.late_rate + 0.01 * self.late_n, 1.0)
+					self.late_since = None
+				self.late_rate *= 0.99
+
+			# Late packets stay on the grid until it is known whether packets were lost
+			if self.late_since is None:
+				if t < pred:
+					# Packets read in one burst share their arrival time, don't
+					# pull back past half a period after the previous sample
+					pred = max(t, self.t + (n - 0.5) * period)
+				else:
+					pred += self.alpha * (t - pred)
+		self.t = pred
+		self.index = x = self.index + n
+
+		self.updates += 1
+		if not self.updates & 7:
+			# The drift is slow, fitting every 8th packet is enough
+			self.add_point(float(x), float(t - self.t_ref))
+
+		return x - n + 1, int(pred - (n - 1) * period)
+
+	def run_length(self):
+		'''
+		Packets that have to arrive late in a row to settle that packets were
+		lost, enough that jitter alone makes that many late about once in
+		10000 times.
+		'''
+		if self.late_rate < 0.01:
+			return 2
+		return max(2, math.ceil(-4 / math.log10(min(self.late_rate, 0.99))))
+
+	def add_point(self, x, y):
+		# Exponentially weighted sums for the least squares fit of the period
+		f = self.forget
+		self.sw = f * self.sw + 1.0
+		self.sx = f * self.sx + x
+		self.sy = f * self.sy + y
+		self.sxx = f * self.sxx + x * x
+		self.sxy = f * self.sxy + x * y
+		if self.updates & 255:
+			return
+
+		var = self.sxx * self.sw - self.sx * self.sx
+		if self.sw > 50 and var > 0:
+			period = (self.sxy * self.sw - self.sx * self.sy) / var
+			# Ignore fits outside a plausible clock error
+			if abs(period - self.nominal) < 0.01 * self.nominal:
+				self.period = period
+
+
+class EMGBatcher(object):
+	'''
+	Collects EMG samples into a preallocated size x 8 block and calls
+	h(emg, times) once per block, times holding the time.monotonic_ns()
+	sampling time of each sample, see SampleClock.
+
+	The block is handed over when it is full, or when its oldest sample is
+	latency seconds old, checked as samples arrive. The arrays passed to h are
+	reused for the next block, handlers that keep them must copy them.
+	'''
+	def __init__(self, h, size=50, latency=None, dtype=np.int8):
+		if size < 2:
+			# Raw EMG notifications carry two samples each
+			raise ValueError('EMG batch size must be at least 2')
+		self.h = h
+		self.size = size
+		self.latency = None if latency is None else int(latency * 1e9)
+		self.emg = np.zeros((size, 8), dtype=dtype)
+		self.flat = self.emg.reshape(-1)
+		self.times = np.zeros(size, dtype=np.int64)
+		self.steps = np.arange(size)
+		self.n = 0
+
+	def add(self, vals, t, period=0):
+		'''
+		Adds the len(vals) // 8 samples in vals, the first one sampled at t
+		and the next ones period nanoseconds apart.
+		'''
+		k = len(vals) // 8
+		if self.n + k > self.size:
+			self.flush()
+		n = self.n
+		self.flat[8 * n:8 * (n + k)] = vals
+		self.times[n] = t
+		if k > 1:
+			self.times[n + 1:n + k] = t + period * self.steps[1:k]
+		self.n = n + k
+
+		if self.n == self.size or (self.latency is not None and self.times[n + k - 1] - self.times[0] >= self.latency):
+			self.flush()
+
+	def flush(self):
+		if self.n:
+			n = self.n
+			self.n = 0
+			self.h(self.emg[:n], self.times[:n])
+
+
+def open_serial(tty):
+	return serial.Serial(port=tty, baudrate=9600, dsrdtr=1)
+
+
 class BT(object):
-	'''Implements the non-Myo-specific details of the Bluetooth protocol.'''
-	def __init__(self, tty):
-		self.ser = serial.Serial(port=tty, baudrate=9600, dsrdtr=1)
-		self.buf = []
-		self.lock = threading.Lock()
+	'''
+	Implements the non-Myo-specific details of the Bluetooth protocol.
+
+	The dongle is reached through a transport, the serial port of tty by
+	default. A transport is anything with the read(n), write(data), close()
+	methods and the in_waiting and timeout attributes of a serial.Serial, see
+	pyomyo.transport. If it has a clock() method it gives the arrival time of
+	the last read, instead of time.monotonic_ns().
+	'''
+	def __init__(self, tty=None, transport=None):
+		if transport is None:
+			transport = open_serial(tty)
+		self.ser = transport
+		self.clock = getattr(transport, 'clock', time.monotonic_ns)
+		self.framer = Framer()
+		self.packets = collections.deque()
+		# Held while reading from the port, and across a request and its response
+		self.lock = threading.RLock()
 		self.handlers = []
 
 	# internal data-handling methods
-	def recv_packet(self):
-		n = self.ser.inWaiting() # Windows fix
-
-		while True:
-			c = self.ser.read()
-			if not c:
-				return None
-
-			ret = self.proc_byte(ord(c))
-			if ret:
-				if ret.typ == 0x80:
-					self.handle_event(ret)
-					# Windows fix
-					if n >= 5096:
-						print("Clearning",n)
-						self.ser.flushInput()
-					# End of Windows fix
-				return ret
-
-	def proc_byte(self, c):
-		if not self.buf:
-			if c in [0x00, 0x80, 0x08, 0x88]:  # [BLE response pkt, BLE event pkt, wifi response pkt, wifi event pkt]
-				self.buf.append(c)
-			return None
-		elif len(self.buf) == 1:
-			self.buf.append(c)
-			self.packet_len = 4 + (self.buf[0] & 0x07) + self.buf[1]
+	def read_packets(self):
+		'''
+		Reads everything waiting on the port in a single call and returns
+		the complete packets found, blocks until at least one byte arrives.
+		'''
+		data = self.ser.read(self.ser.in_waiting or 1)
+		if not data:
 			return None
-		else:
-			self.buf.append(c)
+		return self.framer.feed(data, self.clock())
 
-		if self.packet_len and len(self.buf) == self.packet_len:
-			p = Packet(self.buf)
-			self.buf = []
+	def recv_packet(self):
+		with self.lock:
+			while not self.packets:
+				packets = self.read_packets()
+				if packets is None:
+					return None
+				self.packets.extend(packets)
+
+			p = self.packets.popleft()
+			if p.typ == 0x80:
+				self.handle_event(p)
 			return p
-		return None
+
+	def recv_packets(self):
+		'''
+		Returns all the packets available in one pass, reading from the port
+		only when none are pending.
+		'''
+		with self.lock:
+			if self.packets:
+				packets = list(self.packets)
+				self.packets.clear()
+			else:
+				packets = self.read_packets() or []
+
+			for p in packets:
+				if p.typ == 0x80:
+					self.handle_event(p)
+			return packets
 
 	def handle_event(self, p):
 		for h in self.handlers:
@@ -171,16 +466,18 @@ class BT(object):
 		except ValueError:
 			pass
 
-	def wait_event(self, cls, cmd):
+	def wait_event(self, cls, cmd, match=None):
+		'''Waits for an event, match optionally filters on the packet.'''
 		res = [None]
 
 		def h(p):
-			if p.cls == cls and p.cmd == cmd:
-				res[0] = p
-		self.add_handler(h)
-		while res[0] is None:
-			self.recv_packet()
-		self.remove_handler(h)
+			if p.cls == cls and p.cmd == cmd and (match is None or match(p)):
+				res[0] = p.copy()
+		with self.lock:
+			self.add_handler(h)
+			while res[0] is None:
+				self.recv_packet()
+			self.remove_handler(h)
 		return res[0]
 
 	# specific BLE commands
@@ -200,65 +497,102 @@ class BT(object):
 		return self.send_command(3, 0, pack('B', h))
 
 	def read_attr(self, con, attr):
-		self.send_command(4, 4, pack('BH', con, attr))
-		return self.wait_event(4, 5)
+		with self.lock:
+			self.send_command(4, 4, pack('BH', con, attr))
+			# Notifications share the event, wait for the value of attr on con
+			return self.wait_event(4, 5, lambda p: ATTR_HEADER.unpack_from(p.payload)[:2] == (con, attr))
 
 	def write_attr(self, con, attr, val):
-		self.send_command(4, 5, pack('BHB', con, attr, len(val)) + val)
-		return self.wait_event(4, 1)
+		with self.lock:
+			self.send_command(4, 5, pack('BHB', con, attr, len(val)) + val)
+			return self.wait_event(4, 1, lambda p: p.payload[0] == con)
 
 	def send_command(self, cls, cmd, payload=b'', wait_resp=True):
 		s = pack('4B', 0, len(payload), cls, cmd) + payload
-		self.ser.write(s)
+		with self.lock:
+			self.ser.write(s)
 
-		while True:
-			p = self.recv_packet()
-			# no timeout, so p won't be None
-			if p.typ == 0:
-				return p
-			# not a response: must be an event
-			self.handle_event(p)
+			while True:
+				p = self.recv_packet()
+				# None when the port has a read timeout set, keep waiting
+				if p is None:
+					continue
+				if p.typ == 0:
+					return p.copy()
+				# not a response: an event, recv_packet has handled it already
 
 
 class Myo(object):
 	'''Implements the Myo-specific communication protocol.'''
 
-	def __init__(self, tty=None, mode=1):
-		if tty is None:
-			tty = self.detect_tty()
-		if tty is None:
-			raise ValueError('Myo dongle not found!')
+	def __init__(self, tty=None, mode=1, bt=None):
+		if bt is None:
+			if tty is None:
+				tty = self.detect_tty()
+			if tty is None:
+				raise ValueError('Myo dongle not found!')
+			bt = BT(tty)
 
-		self.bt = BT(tty)
+		# bt may be shared with other Myos connected through the same dongle
+		self.bt = bt
 		self.conn = None
+		# Set by connect
+		self.addr = None
+		self.firmware = None
 		self.emg_handlers = []
 		self.imu_handlers = []
 		self.arm_handlers = []
 		self.pose_handlers = []
 		self.battery_handlers = []
+		self.emg_batchers = []
 		self.mode = mode
 
+		# Sampling time and index of the sample being handed to the handlers,
+		# handlers needing timestamps read them from here
+		self.packet_time = None
+		raw = emg_mode(mode) in (emg_mode.FILTERED, emg_mode.RAW)
+		self.emg_clock = SampleClock(200 if raw else 50)
+		self.imu_clock = SampleClock(50)
+		self.emg_time = self.emg_index = None
+		self.imu_time = self.imu_index = None
+
+		# Attribute handle -> (decoder, handler) for incoming notifications
+		self.decoders = {}
+		# Unpack a 17 byte array, first 16 are 8 unsigned shorts, last one an unsigned char
+		self.add_decoder(0x27, EMG_STRUCT, self.handle_emg)
+		# Notification handles corresponding to the four EMG characteristics
+		for attr in (0x2b, 0x2e, 0x31, 0x34):
+			self.add_decoder(attr, RAW_EMG_STRUCT, self.handle_raw_emg)
+		# IMU characteristic handle
+		self.add_decoder(0x1c, IMU_STRUCT, self.handle_imu)
+		# Classifier characteristic handle
+		self.add_decoder(0x23, CLASSIFIER_STRUCT, self.handle_classifier)
+		# Battery characteristic handle
+		self.add_decoder(0x11, BATTERY_STRUCT, self.handle_battery)
+
 	def detect_tty(self):
-		for p in comports():
-			if re.search(r'PID=2458:0*1', p[2]):
-				print('using device:', p[0])
-				return p[0]
+		for tty in detect_ttys():
+			print('using device:', tty)
+			return tty
 
 		return None
 
 	def run(self):
 		self.bt.recv_packet()
 
-	def connect(self, addr=None):
+	def connect(self, addr=None, reset=True):
 		'''
 		Connect to a Myo
 		Addr is the MAC address in format: [93, 41, 55, 245, 82, 194]
+		Reset drops every connection of the dongle first, MyoHub turns it off
+		to keep the other armbands connected.
 		'''
 		# stop everything from before
-		self.bt.end_scan()
-		self.bt.disconnect(0)
-		self.bt.disconnect(1)
-		self.bt.disconnect(2)
+		if reset:
+			self.bt.end_scan()
+			self.bt.disconnect(0)
+			self.bt.disconnect(1)
+			self.bt.disconnect(2)
 
 		# start scanning
 		if (addr is None):
@@ -266,21 +600,26 @@ class Myo(object):
 			self.bt.discover()
 			while True:
 				p = self.bt.recv_packet()
+				# Skip data from other armbands streaming through the dongle
+				if p is None or (p.cls, p.cmd) != (6, 0):
+					continue
 				print('scan response:', p)
 
-				if p.payload.endswith(b'\x06\x42\x48\x12\x4A\x7F\x2C\x48\x47\xB9\xDE\x04\xA9\x01\x00\x06\xD5'):
+				if p.payload[-17:] == b'\x06\x42\x48\x12\x4A\x7F\x2C\x48\x47\xB9\xDE\x04\xA9\x01\x00\x06\xD5':
 					addr = list(multiord(p.payload[2:8]))
 					break
 			self.bt.end_scan()
 		# connect and wait for status event
 		conn_pkt = self.bt.connect(addr)
 		self.conn = multiord(conn_pkt.payload)[-1]
-		self.bt.wait_event(3, 0)
+		self.addr = list(addr)
+		self.bt.wait_event(3, 0, lambda p: p.payload[0] == self.conn)
 
 		# get firmware version
 		fw = self.read_attr(0x17)
 		_, _, _, _, v0, v1, v2, v3 = unpack('BHBBHHHH', fw.payload)
 		print('firmware version: %d.%d.%d.%d' % (v0, v1, v2, v3))
+		self.firmware = (v0, v1, v2, v3)
 
 		self.old = (v0 == 0)
 
@@ -316,7 +655,7 @@ class Myo(object):
 
 		else:
 			name = self.read_attr(0x03)
-			print('device name: %s' % name.payload)
+			print('device name: %s' % name.payload.tobytes())
 
 			# enable IMU data
 			self.write_attr(0x1d, b'\x01\x00')
@@ -341,59 +680,74 @@ class Myo(object):
 			# enable battery notifications
 			self.write_attr(0x12, b'\x01\x10')
 
-		# add data handlers
-		def handle_data(p):
-			if (p.cls, p.cmd) != (4, 5):
-				return
+		self.bt.add_handler(self.handle_data)
 
-			c, attr, typ = unpack('BHB', p.payload[:4])
-			pay = p.payload[5:]
-			#print(attr,"attr")
-			if attr == 0x27: #Detect EMG data
-				# Unpack a 17 byte array, first 16 are 8 unsigned shorts, last one an unsigned char
-				vals = unpack('8HB', pay)
-				# not entirely sure what the last byte is, but it's a bitmask that
-				# seems to indicate which sensors think they're being moved around or
-				# something
-				emg = vals[:8]
-				moving = vals[8]
-				self.on_emg(emg, moving)
-			# Read notification handles corresponding to the for EMG characteristics
-			elif attr == 0x2b or attr == 0x2e or attr == 0x31 or attr == 0x34: #Detect emg data
-				'''According to http://developerblog.myo.com/myocraft-emg-in-the-bluetooth-protocol/
-				each characteristic sends two secuential readings in each update,
-				so the received payload is split in two samples. According to the
-				Myo BLE specification, the data type of the EMG samples is int8_t.
-				'''
-				emg1 = struct.unpack('<8b', pay[:8])
-				emg2 = struct.unpack('<8b', pay[8:])
-				self.on_emg(emg1, 0)
-				self.on_emg(emg2, 0)
-			# Read IMU characteristic handle
-			elif attr == 0x1c: #Detect IMU data
-				vals = unpack('10h', pay)
-				quat = vals[:4]
-				acc = vals[4:7]
-				gyro = vals[7:10]
-				self.on_imu(quat, acc, gyro)
-			# Read classifier characteristic handle
-			elif attr == 0x23:
-				typ, val, xdir, _, _, _ = unpack('6B', pay)
-
-				if typ == 1:  # on arm
-					self.on_arm(Arm(val), XDirection(xdir))
-				elif typ == 2:  # removed from arm
-					self.on_arm(Arm.UNKNOWN, XDirection.UNKNOWN)
-				elif typ == 3:  # pose
-					self.on_pose(Pose(val))
-			# Read battery characteristic handle
-			elif attr == 0x11:
-				battery_level = ord(pay)
-				self.on_battery(battery_level)
-			else:
-				print('data with unknown attr: %02X %s' % (attr, p))
+	def handle_data(self, p):
+		if p.cls != 4 or p.cmd != 5:
+			return
 
-		self.bt.add_handler(handle_data)
+		c, attr, typ = ATTR_HEADER.unpack_from(p.payload)
+		try:
+			decoder, h = self.decoders[attr]
+		except KeyError:
+			print('data with unknown attr: %02X %s' % (attr, p))
+			return
+		self.packet_time = p.t if p.t is not None else time.monotonic_ns()
+		h(decoder.unpack(p.payload[5:]))
+
+	def add_decoder(self, attr, fmt, h):
+		'''
+		Routes notifications from the attribute handle attr to h.
+		fmt is a struct.Struct or a little endian format string, h is called
+		with the tuple unpacked from the notification payload.
+		'''
+		if not isinstance(fmt, struct.Struct):
+			fmt = struct.Struct('<' + fmt)
+		self.decoders[attr] = (fmt, h)
+
+	def remove_decoder(self, attr):
+		self.decoders.pop(attr, None)
+
+	def handle_emg(self, vals):
+		# not entirely sure what the last byte is, but it's a bitmask that
+		# seems to indicate which sensors think they're being moved around or
+		# something
+		self.emg_index, self.emg_time = self.emg_clock.update(self.packet_time)
+		self.on_emg(vals[:8], vals[8])
+		for b in self.emg_batchers:
+			b.add(vals[:8], self.emg_time)
+
+	def handle_raw_emg(self, vals):
+		'''According to http://developerblog.myo.com/myocraft-emg-in-the-bluetooth-protocol/
+		each characteristic sends two secuential readings in each update,
+		so the received payload is split in two samples. According to the
+		Myo BLE specification, the data type of the EMG samples is int8_t.
+		'''
+		index, t = self.emg_clock.update(self.packet_time, 2)
+		period = self.emg_clock.period
+		self.emg_index, self.emg_time = index, t
+		self.on_emg(vals[:8], 0)
+		self.emg_index, self.emg_time = index + 1, int(t + period)
+		self.on_emg(vals[8:], 0)
+		for b in self.emg_batchers:
+			b.add(vals, t, period)
+
+	def handle_imu(self, vals):
+		self.imu_index, self.imu_time = self.imu_clock.update(self.packet_time)
+		self.on_imu(vals[:4], vals[4:7], vals[7:10])
+
+	def handle_classifier(self, vals):
+		typ, val, xdir, _, _, _ = vals
+
+		if typ == 1:  # on arm
+			self.on_arm(Arm(val), XDirection(xdir))
+		elif typ == 2:  # removed from arm
+			self.on_arm(Arm.UNKNOWN, XDirection.UNKNOWN)
+		elif typ == 3:  # pose
+			self.on_pose(Pose(val))
+
+	def handle_battery(self, vals):
+		self.on_battery(vals[0])
 
 	def write_attr(self, attr, val):
 		if self.conn is not None:
@@ -556,6 +910,22 @@ class Myo(object):
 	def add_emg_handler(self, h):
 		self.emg_handlers.append(h)
 
+	def add_emg_batch_handler(self, h, size=50, latency=None):
+		'''
+		Calls h(emg, times) with blocks of up to size EMG samples instead of
+		once per sample, see EMGBatcher. The block is uint16 in the
+		PREPROCESSED mode and int8 in the raw modes.
+		'''
+		dtype = np.uint16 if emg_mode(self.mode) == emg_mode.PREPROCESSED else np.int8
+		batcher = EMGBatcher(h, size, latency, dtype)
+		self.emg_batchers.append(batcher)
+		return batcher
+
+	def flush_emg_batches(self):
+		'''Hands any partially filled EMG blocks to their handlers.'''
+		for b in self.emg_batchers:
+			b.flush()
+
 	def add_imu_handler(self, h):
 		self.imu_handlers.append(h)
 
@@ -588,6 +958,178 @@ class Myo(object):
 		for h in self.battery_handlers:
 			h(battery_level)
 
+class MyoHub(object):
+	'''
+	Streams up to three Myos through a single BLED112 dongle.
+
+	All the Myos share one BT, so one reader (run(), or a MyoStream on any of
+	them) serves every armband. Notifications are routed to the right Myo by
+	the connection handle they carry, each Myo keeping its own handlers.
+	'''
+	MAX_CONNECTIONS = 3
+
+	def __init__(self, tty=None):
+		if tty is None:
+			ttys = detect_ttys()
+			if not ttys:
+				raise ValueError('Myo dongle not found!')
+			tty = ttys[0]
+
+		self.bt = BT(tty)
+		self.myos = {}
+		self.bt.add_handler(self.route)
+
+		# stop everything from before
+		self.bt.end_scan()
+		for h in range(self.MAX_CONNECTIONS):
+			self.bt.disconnect(h)
+
+	def add_myo(self, addr=None, mode=emg_mode.PREPROCESSED):
+		'''Connects another Myo, scanning for one if addr is None, and returns it.'''
+		if len(self.myos) >= self.MAX_CONNECTIONS:
+			raise ValueError('The dongle supports at most %d connections' % self.MAX_CONNECTIONS)
+
+		m = Myo(mode=mode, bt=self.bt)
+		m.connect(addr, reset=False)
+		# Data reaches it through route() instead
+		self.bt.remove_handler(m.handle_data)
+		self.myos[m.conn] = m
+		return m
+
+	def route(self, p):
+		if p.cls != 4 or p.cmd != 5:
+			return
+		m = self.myos.get(p.payload[0])
+		if m is not None:
+			m.handle_data(p)
+
+	def run(self):
+		self.bt.recv_packets()
+
+	def disconnect(self):
+		for m in self.myos.values():
+			m.disconnect()
+		self.myos = {}
+
+
+class MyoStream(object):
+	'''
+	Reads a connected Myo from a dedicated thread.
+
+	The reader thread drains the serial port continuously and queues EMG and
+	IMU samples as (kind, t, values) tuples, kind being 'emg' or 'imu' and t
+	the time.monotonic_ns() sampling time from Myo.emg_time or Myo.imu_time. The queue holds at most maxlen
+	samples, when consumers fall behind the oldest ones are dropped and
+	counted in dropped. Commands such as m.vibrate() can still be sent from
+	other threads while streaming. If reading the port fails the stream stops
+	and get(), or the iteration, raises the error once the queue is drained.
+
+		with MyoStream(m) as stream:
+			for kind, t, values in stream:
+				...
+	'''
+	def __init__(self, myo, maxlen=4096, timeout=0.1):
+		self.myo = myo
+		self.maxlen = maxlen
+		# Read timeout on the port, so the thread notices when it is stopped
+		self.timeout = timeout
+		self.buf = collections.deque()
+		self.cond = threading.Condition()
+		self.dropped = 0
+		self.running = False
+		self.thread = None
+		# Set when the reader thread failed, raised by get()
+		self.error = None
+
+		myo.add_emg_handler(self.proc_emg)
+		myo.add_imu_handler(self.proc_imu)
+
+	def __enter__(self):
+		self.start()
+		return self
+
+	def __exit__(self, *args):
+		self.stop()
+
+	def __iter__(self):
+		while True:
+			item = self.get()
+			if item is None:
+				return
+			yield item
+
+	def start(self):
+		ser = self.myo.bt.ser
+		self.old_timeout = ser.timeout
+		ser.timeout = self.timeout
+		self.running = True
+		self.error = None
+		self.thread = threading.Thread(target=self.read, daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		with self.cond:
+			self.running = False
+			self.cond.notify_all()
+		if self.thread is not None:
+			self.thread.join()
+			self.thread = None
+			self.myo.bt.ser.timeout = self.old_timeout
+
+	def read(self):
+		try:
+			while self.running:
+				self.myo.bt.recv_packets()
+		except EOFError:
+			# End of a replayed capture
+			with self.cond:
+				self.running = False
+				self.cond.notify_all()
+		except Exception as e:
+			# The port failed, stop and hand the error to the consumers
+			with self.cond:
+				self.error = e
+				self.running = False
+				self.cond.notify_all()
+
+	def put(self, item):
+		if not self.running:
+			return
+		with self.cond:
+			if len(self.buf) >= self.maxlen:
+				self.buf.popleft()
+				self.dropped += 1
+			self.buf.append(item)
+			self.cond.notify()
+
+	def proc_emg(self, emg, moving):
+		self.put(('emg', self.myo.emg_time, emg))
+
+	def proc_imu(self, quat, acc, gyro):
+		self.put(('imu', self.myo.imu_time, (quat, acc, gyro)))
+
+	def get(self, timeout=None):
+		'''
+		Returns the oldest queued sample, waiting up to timeout seconds for one.
+		Returns None on timeout, or once the stream is stopped and drained.
+		If the reader thread failed, raises its error once drained instead.
+		'''
+		with self.cond:
+			self.cond.wait_for(lambda: self.buf or not self.running, timeout)
+			if self.buf:
+				return self.buf.popleft()
+			if self.error is not None:
+				raise self.error
+			return None
+
+	def get_all(self):
+		'''Returns all the queued samples without waiting.'''
+		with self.cond:
+			items = list(self.buf)
+			self.buf.clear()
+		return items
+
+
 def cls():
 	# Clear the screen in a cross platform way
 	# https://stackoverflow.com/questions/517970/how-to-clear-the-interpreter-console
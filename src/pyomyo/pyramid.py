@@ -0,0 +1,157 @@
+'''
+Min/max/mean decimation pyramid for browsing long recordings.
+
+Level 0 summarises every base samples of a stream by their per channel
+minimum, maximum and mean, and each next level summarises pairs of buckets
+of the level below, so level i buckets span base * 2**i samples. Plotting
+the minimum and maximum of a level keeps every peak of the signal while
+drawing only about one point per pixel, whatever the zoom.
+
+The pyramid is extended by Recording.pyramid() from the samples it does not
+summarise yet, which Recorder calls once a recording is closed, and saved
+next to the recording so it is built only once.
+
+	times, low, high, mean = r.view('emg', start, end, pixels=1500)
+'''
+
+import os
+
+import numpy as np
+
+class Level(object):
+	'''The buckets of one level, as growing lists of arrays.'''
+	def __init__(self, width, dtype):
+		self.parts = {'t': [], 'min': [], 'max': [], 'mean': []}
+		self.cache = None
+		self.width = width
+		self.dtype = dtype
+
+	def append(self, t, mn, mx, mean):
+		if len(t):
+			for k, a in zip(('t', 'min', 'max', 'mean'), (t, mn, mx, mean)):
+				self.parts[k].append(a)
+			self.cache = None
+
+	def arrays(self):
+		'''(t, min, max, mean) of every bucket.'''
+		if self.cache is None:
+			empty = {'t': np.empty(0, np.int64), 'min': np.empty((0, self.width), self.dtype),
+				'max': np.empty((0, self.width), self.dtype), 'mean': np.empty((0, self.width), np.float32)}
+			self.cache = tuple(np.concatenate(self.parts[k]) if self.parts[k] else empty[k] for k in ('t', 'min', 'max', 'mean'))
+			# Keep one part, later appends concatenate onto it
+			for k, a in zip(('t', 'min', 'max', 'mean'), self.cache):
+				self.parts[k] = [a] if len(a) else []
+		return self.cache
+
+	def __len__(self):
+		return len(self.arrays()[0])
+
+
+class Pyramid(object):
+	'''
+	Decimation pyramid of one stream of width channels.
+
+	extend() summarises samples incrementally: the samples and buckets not
+	yet making a whole bucket of the next level are carried over to the next
+	call, so the last base * 2**i samples are missing from level i until more
+	arrive.
+	'''
+	def __init__(self, width, dtype, base=32):
+		self.width = width
+		self.dtype = np.dtype(dtype)
+		self.base = base
+		self.count = 0
+		self.levels = []
+		# Samples short of a level 0 bucket, and a bucket without its pair per level
+		self.raw_t = np.empty(0, np.int64)
+		self.raw_v = np.empty((0, width), self.dtype)
+		self.carry = []
+
+	def extend(self, times, values):
+		'''Adds the samples values, sampled at times.'''
+		self.count += len(times)
+		times = np.concatenate((self.raw_t, np.asarray(times, np.int64)))
+		values = np.concatenate((self.raw_v, np.asarray(values, self.dtype).reshape(-1, self.width)))
+		k = len(times) // self.base * self.base
+		self.raw_t = times[k:]
+		self.raw_v = values[k:]
+		if k == 0:
+			return
+
+		blocks = values[:k].reshape(-1, self.base, self.width)
+		buckets = (times[:k:self.base], blocks.min(axis=1), blocks.max(axis=1), blocks.mean(axis=1, dtype=np.float32))
+		i = 0
+		while len(buckets[0]):
+			if i == len(self.levels):
+				self.levels.append(Level(self.width, self.dtype))
+				self.carry.append(None)
+			self.levels[i].append(*buckets)
+			buckets = self.pair(i, buckets)
+			i += 1
+
+	def pair(self, i, buckets):
+		'''Buckets of level i + 1 made from the new buckets of level i.'''
+		if self.carry[i] is not None:
+			buckets = tuple(np.concatenate((c, b)) for c, b in zip(self.carry[i], buckets))
+		n = len(buckets[0]) // 2 * 2
+		self.carry[i] = tuple(b[n:] for b in buckets) if n < len(buckets[0]) else None
+		t, mn, mx, mean = (b[:n] for b in buckets)
+		return (t[0::2], np.minimum(mn[0::2], mn[1::2]), np.maximum(mx[0::2], mx[1::2]),
+			(mean[0::2] + mean[1::2]) / np.float32(2))
+
+	def choose(self, start, end, pixels):
+		'''
+		Coarsest level with at least pixels buckets between start and end,
+		and the bucket range, or None when even level 0 is too coarse.
+		'''
+		for i in range(len(self.levels) - 1, -1, -1):
+			t = self.levels[i].arrays()[0]
+			a = 0 if start is None else np.searchsorted(t, start, 'left')
+			b = len(t) if end is None else np.searchsorted(t, end, 'left')
+			if b - a >= pixels:
+				return i, a, b
+		return None
+
+	def view(self, start=None, end=None, pixels=1000, channels=None):
+		'''
+		(times, min, max, mean) of the coarsest level giving at least pixels
+		points between start and end, None if the raw samples are needed.
+		'''
+		chosen = self.choose(start, end, pixels)
+		if chosen is None:
+			return None
+		i, a, b = chosen
+		t, mn, mx, mean = self.levels[i].arrays()
+		if channels is None:
+			return t[a:b], mn[a:b], mx[a:b], mean[a:b]
+		return t[a:b], mn[a:b, channels], mx[a:b, channels], mean[a:b, channels]
+
+	def save(self, path):
+		arrays = {'count': np.int64(self.count), 'base': np.int64(self.base), 'raw_t': self.raw_t, 'raw_v': self.raw_v}
+		for i, level in enumerate(self.levels):
+			for k, a in zip(('t', 'min', 'max', 'mean'), level.arrays()):
+				arrays['%d/%s' % (i, k)] = a
+			if self.carry[i] is not None:
+				for k, a in zip(('t', 'min', 'max', 'mean'), self.carry[i]):
+					arrays['%d/carry_%s' % (i, k)] = a
+		tmp = path + '.tmp'
+		with open(tmp, 'wb') as f:
+			np.savez(f, **arrays)
+		os.replace(tmp, path)
+
+	@classmethod
+	def load(cls, path, width, dtype):
+		with np.load(path) as f:
+			p = cls(width, dtype, int(f['base']))
+			p.count = int(f['count'])
+			p.raw_t = f['raw_t']
+			p.raw_v = f['raw_v']
+			i = 0
+			while '%d/t' % i in f:
+				level = Level(width, p.dtype)
+				level.append(*(f['%d/%s' % (i, k)] for k in ('t', 'min', 'max', 'mean')))
+				p.levels.append(level)
+				carry = '%d/carry_t' % i
+				p.carry.append(tuple(f['%d/carry_%s' % (i, k)] for k in ('t', 'min', 'max', 'mean')) if carry in f else None)
+				i += 1
+		return p
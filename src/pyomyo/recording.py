@@ -0,0 +1,749 @@
+'''
+Chunked binary recordings of Myo sessions.
+
+A recording is a small JSON header, with the EMG mode, firmware and device
+address, followed by an append-only sequence of chunks. Each chunk holds a
+block of samples of one stream as typed columns: the int64
+time.monotonic_ns() sampling times, then the values. The streams are EMG
+(8 x uint16 preprocessed, 8 x int8 raw), IMU (10 x int16, quaternion,
+accelerometer and gyroscope), and the pose, arm and battery events.
+
+Recording memory maps the file and only reads the chunk headers when opened,
+so long sessions open instantly and reading a channel or time range touches
+only the chunks holding it.
+
+	with RecordingWriter('session.myo', mode=emg_mode.RAW, codec='zlib') as w:
+		w.write('emg', times, emg)
+
+	r = Recording('session.myo')
+	times, emg = r.read('emg', start=r.start + 10**9, channels=[0, 1])
+	for times, emg in r.segments('emg', 'pose', Pose.FIST):
+		...
+
+The chunk table is kept in a sidecar index, session.myo.idx, rewritten when
+the recording has grown, so opening reads only chunks it has not seen. The
+pose and arm events, and labels added through r.events, are indexed as
+intervals, see EventIndex.
+
+File layout, little endian:
+	b'PYOMYORC', uint16 version, uint32 header length, JSON header,
+	padding to 8 bytes
+	then chunks of:
+		b'CHNK', uint8 stream, uint8 codec, uint16 flags, uint32 samples,
+		int64 first time, int64 last time, uint32 payload length,
+		payload padded to 8 bytes
+	The payload is the times and the values encoded by pyomyo.codec, with no
+	compression by default, delta coded and compressed with zlib or lzma for
+	archives, roughly an order of magnitude smaller.
+A chunk cut short by a crash is ignored when reading.
+'''
+
+import collections
+import json
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from pyomyo.codec import CODECS, RAW, decode, encode
+from pyomyo.pyomyo import Arm, Pose, emg_mode
+from pyomyo.pyramid import Pyramid
+
+MAGIC = b'PYOMYORC'
+VERSION = 1
+FILE_HEADER = struct.Struct('<8sHI')
+CHUNK_MAGIC = b'CHNK'
+CHUNK_HEADER = struct.Struct('<4sBBHIqqI')
+# Chunk table columns, as saved in the sidecar index
+COLUMNS = ('offset', 'count', 't_first', 't_last', 'codec', 'nbytes')
+EMPTY_LABELS = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, str))
+
+def default_streams(mode):
+	'''Streams a Myo produces in mode, name -> (dtype, width).'''
+	emg_dtype = 'uint16' if emg_mode(mode) == emg_mode.PREPROCESSED else 'int8'
+	return {
+		'emg': (emg_dtype, 8),
+		'imu': ('int16', 10),
+		'pose': ('uint8', 1),
+		'arm': ('uint8', 2),
+		'battery': ('uint8', 1),
+	}
+
+def padding(n):
+	return -n % 8
+
+def pyramid_path(path, stream):
+	return '%s.%s.lod' % (path, stream)
+
+
+class RecordingWriter(object):
+	'''
+	Writes a recording. Every write() appends one chunk, callers batch the
+	samples, see Recorder for a writer fed by a Myo. codec is 'raw', 'zlib'
+	or 'lzma', or its number in pyomyo.codec, level its compression level.
+	'''
+	def __init__(self, path, mode=emg_mode.PREPROCESSED, firmware=None, address=None, streams=None, meta=None,
+			codec=RAW, level=None):
+		self.codec = CODECS[codec] if isinstance(codec, str) else codec
+		self.level = level
+		self.streams = streams or default_streams(mode)
+		self.ids = {name: i for i, name in enumerate(self.streams)}
+		self.dtypes = {name: np.dtype(dtype) for name, (dtype, width) in self.streams.items()}
+		header = {
+			'mode': emg_mode(mode).value,
+			'mode_name': emg_mode(mode).name,
+			'firmware': list(firmware) if firmware else None,
+			'address': list(address) if address else None,
+			'streams': [[name, dtype, width] for name, (dtype, width) in self.streams.items()],
+			'meta': meta or {},
+		}
+		js = json.dumps(header).encode()
+		self.f = open(path, 'wb')
+		self.f.write(FILE_HEADER.pack(MAGIC, VERSION, len(js)) + js)
+		self.f.write(bytes(padding(FILE_HEADER.size + len(js))))
+		self.samples = dict.fromkeys(self.streams, 0)
+
+	@classmethod
+	def for_myo(cls, path, myo, meta=None, **kwargs):
+		'''A writer whose header describes the connected myo.'''
+		return cls(path, myo.mode, myo.firmware, myo.addr, meta=meta, **kwargs)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def write(self, stream, times, values):
+		'''Appends the samples values, one row per sample, sampled at times.'''
+		width = self.streams[stream][1]
+		times = np.ascontiguousarray(times, dtype=np.int64)
+		values = np.ascontiguousarray(values, dtype=self.dtypes[stream]).reshape(-1, width)
+		n = len(times)
+		if len(values) != n:
+			raise ValueError('%d times for %d samples' % (n, len(values)))
+		if n == 0:
+			return
+		payload = encode([times.reshape(n, 1), values], self.codec, self.level)
+		self.f.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self.ids[stream], self.codec, 0, n, times[0], times[-1], len(payload)))
+		self.f.write(payload)
+		self.f.write(bytes(padding(len(payload))))
+		self.samples[stream] += n
+
+	def flush(self):
+		self.f.flush()
+
+	def close(self):
+		self.f.close()
+
+
+class Recording(object):
+	'''
+	Reads a recording through a memory map.
+
+	chunks() yields views into the file. read() and samples() return views as
+	well when the samples lie in a single chunk, read only like the file, and
+	otherwise copy just the requested samples and channels. Compressed chunks
+	are decoded one at a time as they are needed. Times are in nanoseconds.
+	'''
+	def __init__(self, path):
+		self.path = path
+		self.buf = np.memmap(path, np.uint8, 'r')
+		magic, version, n = FILE_HEADER.unpack_from(self.buf)
+		if magic != MAGIC:
+			raise ValueError('%s is not a pyomyo recording' % path)
+		if version > VERSION:
+			raise ValueError('%s is a version %d recording, only %d is supported' % (path, version, VERSION))
+		self.header = json.loads(self.buf[FILE_HEADER.size:FILE_HEADER.size + n].tobytes())
+		self.mode = emg_mode(self.header['mode'])
+		self.firmware = self.header['firmware']
+		self.address = self.header['address']
+		self.meta = self.header['meta']
+		self.streams = {name: (np.dtype(dtype), width) for name, dtype, width in self.header['streams']}
+		self.names = list(self.streams)
+
+		offset = FILE_HEADER.size + n
+		self.data_start = offset + padding(offset)
+		self.labels = EMPTY_LABELS
+		self.events_index = None
+		self.pyramids = {}
+
+		# Chunk headers come from the sidecar index when it is up to date,
+		# only chunks appended since it was saved are read from the file
+		tables, self.data_end = self.load_index()
+		end = self.scan(tables)
+		self.index = {name: self.build_index(np.array(rows, dtype=np.int64).reshape(-1, 6)) for name, rows in tables.items()}
+		if end != self.data_end:
+			self.data_end = end
+			try:
+				self.save_index()
+			except OSError:
+				# Read only location, the index is rebuilt next time
+				pass
+
+	def scan(self, tables):
+		'''
+		Reads the headers of the chunks from data_end on, appending
+		(offset, count, t_first, t_last, codec, nbytes) rows to tables.
+		Returns the end of the last whole chunk.
+		'''
+		offset = self.data_end
+		size = len(self.buf)
+		while offset + CHUNK_HEADER.size <= size:
+			magic, stream, codec, flags, n, t0, t1, nbytes = CHUNK_HEADER.unpack_from(self.buf, offset)
+			start = offset + CHUNK_HEADER.size
+			if magic != CHUNK_MAGIC or start + nbytes > size:
+				break
+			tables[self.names[stream]].append((start, n, t0, t1, codec, nbytes))
+			offset = start + nbytes + padding(nbytes)
+		return offset
+
+	def build_index(self, rows):
+		return {
+			'offset': rows[:, 0],
+			'count': rows[:, 1],
+			't_first': rows[:, 2],
+			't_last': rows[:, 3],
+			'codec': rows[:, 4],
+			'nbytes': rows[:, 5],
+			# Position of the first sample of each chunk in the stream
+			'first': np.concatenate(([0], np.cumsum(rows[:, 1]))),
+		}
+
+	# Sidecar index
+	@property
+	def index_path(self):
+		return self.path + '.idx'
+
+	def load_index(self):
+		'''
+		Chunk tables and end offset from the sidecar index, empty tables and
+		the start of the chunks if there is none or it does not match the file.
+		'''
+		empty = {name: [] for name in self.names}, self.data_start
+		try:
+			with np.load(self.index_path) as f:
+				end = int(f['data_end'])
+				tables = {name: f['chunks/' + name].tolist() for name in self.names}
+				labels = (f['label_start'], f['label_end'], f['label_name'])
+				last = f['last_chunk']
+		except (OSError, KeyError, ValueError):
+			return empty
+
+		# The last indexed chunk must still be where the index says
+		if end > len(self.buf):
+			return empty
+		if len(last):
+			offset, stream, n, t0 = last.tolist()
+			if offset + CHUNK_HEADER.size > len(self.buf):
+				return empty
+			magic, s, _, _, count, first, _, _ = CHUNK_HEADER.unpack_from(self.buf, offset)
+			if (magic, s, count, first) != (CHUNK_MAGIC, stream, n, t0):
+				return empty
+		self.labels = labels
+		return tables, end
+
+	def save_index(self):
+		'''Writes the sidecar index, with the labels added to events.'''
+		arrays = {'chunks/' + name: np.column_stack([ix[k] for k in COLUMNS]).reshape(-1, 6) for name, ix in self.index.items()}
+		# The chunk ending at data_end, to recognise the file next time
+		last = max(((ix['offset'][-1], self.names.index(name), ix['count'][-1], ix['t_first'][-1])
+			for name, ix in self.index.items() if len(ix['offset'])), default=None)
+		arrays['last_chunk'] = np.array([] if last is None else [last[0] - CHUNK_HEADER.size] + list(last[1:]), dtype=np.int64)
+		arrays['data_end'] = np.int64(self.data_end)
+		starts, ends, names = self.events.labels() if self.events_index is not None else self.labels
+		arrays['label_start'] = np.asarray(starts, np.int64)
+		arrays['label_end'] = np.asarray(ends, np.int64)
+		arrays['label_name'] = np.asarray(names, dtype=str)
+
+		tmp = self.index_path + '.tmp'
+		with open(tmp, 'wb') as f:
+			np.savez(f, **arrays)
+		os.replace(tmp, self.index_path)
+
+	@property
+	def events(self):
+		'''EventIndex of the pose, arm and label intervals, built on first use.'''
+		if self.events_index is None:
+			self.events_index = EventIndex.from_recording(self)
+		return self.events_index
+
+	# Level of detail
+	def pyramid(self, stream, base=32):
+		'''
+		Decimation pyramid of stream, loaded from its .lod file next to the
+		recording and extended with the samples it does not cover yet.
+		'''
+		p = self.pyramids.get(stream)
+		count = self.count(stream)
+		if p is not None and p.count == count:
+			return p
+
+		dtype, width = self.streams[stream]
+		path = pyramid_path(self.path, stream)
+		if p is None:
+			try:
+				p = Pyramid.load(path, width, dtype)
+			except (OSError, KeyError, ValueError):
+				p = None
+		# Not from this recording, or from a different one under the same name
+		if p is not None and (p.count > count or (p.levels and p.levels[0].arrays()[0][0] != self.index[stream]['t_first'][0])):
+			p = None
+		if p is None:
+			p = Pyramid(width, dtype, base)
+
+		if p.count < count:
+			ix = self.index[stream]
+			done = p.count
+			for i in range(np.searchsorted(ix['first'], done, 'right') - 1, len(ix['count'])):
+				t, v = self.chunk(stream, i)
+				a = max(done - ix['first'][i], 0)
+				p.extend(t[a:], v[a:])
+			try:
+				p.save(path)
+			except OSError:
+				pass
+		self.pyramids[stream] = p
+		return p
+
+	def view(self, stream, start=None, end=None, pixels=1000, channels=None):
+		'''
+		(times, min, max, mean) of stream between start and end at about
+		pixels points, from the pyramid when the range holds more samples
+		than that and from the samples themselves, min = max = mean, when not.
+		'''
+		v = self.pyramid(stream).view(start, end, pixels, channels)
+		if v is not None:
+			return v
+		t, values = self.read(stream, start, end, channels)
+		return t, values, values, values.astype(np.float32)
+
+	def segments(self, stream, kind, value, start=None, end=None, channels=None):
+		'''
+		Yields the (times, values) of stream during each kind interval with
+		value, see EventIndex, e.g. r.segments('emg', 'pose', Pose.FIST).
+		Only the chunks holding the segments are read.
+		'''
+		for s, e in zip(*self.events.segments(kind, value, start, end)):
+			yield self.read(stream, s, e, channels)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.buf = None
+
+	@property
+	def start(self):
+		'''Time of the first sample of any stream.'''
+		firsts = [ix['t_first'][0] for ix in self.index.values() if len(ix['t_first'])]
+		return min(firsts) if firsts else None
+
+	@property
+	def end(self):
+		'''Time of the last sample of any stream.'''
+		lasts = [ix['t_last'].max() for ix in self.index.values() if len(ix['t_last'])]
+		return max(lasts) if lasts else None
+
+	def count(self, stream):
+		'''Number of samples of stream.'''
+		return int(self.index[stream]['first'][-1])
+
+	def chunk(self, stream, i):
+		'''
+		(times, values) of the ith chunk of stream, views into the file
+		unless the chunk is compressed.
+		'''
+		ix = self.index[stream]
+		dtype, width = self.streams[stream]
+		start = ix['offset'][i]
+		n = int(ix['count'][i])
+		times, values = decode(self.buf[start:start + ix['nbytes'][i]], [(n, np.int64, 1), (n, dtype, width)], ix['codec'][i])
+		return times.reshape(n), values
+
+	def chunks(self, stream):
+		for i in range(len(self.index[stream]['count'])):
+			yield self.chunk(stream, i)
+
+	def read(self, stream, start=None, end=None, channels=None):
+		'''
+		(times, values) of the samples of stream with start <= time < end,
+		all of them by default. channels selects columns of values.
+		'''
+		ix = self.index[stream]
+		# Chunks overlapping the range, as the times only increase
+		first = 0 if start is None else np.searchsorted(ix['t_last'], start, 'left')
+		last = len(ix['count']) if end is None else np.searchsorted(ix['t_first'], end, 'left')
+
+		pieces = []
+		for i in range(first, last):
+			t, v = self.chunk(stream, i)
+			a = 0 if start is None else np.searchsorted(t, start, 'left')
+			b = len(t) if end is None else np.searchsorted(t, end, 'left')
+			pieces.append((t, v, a, b))
+		return self.gather(stream, pieces, channels)
+
+	def samples(self, stream, first=0, last=None, channels=None):
+		'''(times, values) of the samples of stream at positions first to last.'''
+		ix = self.index[stream]
+		last = self.count(stream) if last is None else min(last, self.count(stream))
+		pieces = []
+		for i in range(max(np.searchsorted(ix['first'], first, 'right') - 1, 0), np.searchsorted(ix['first'], last, 'left')):
+			t, v = self.chunk(stream, i)
+			pieces.append((t, v, max(first - ix['first'][i], 0), min(last - ix['first'][i], len(t))))
+		return self.gather(stream, pieces, channels)
+
+	def gather(self, stream, pieces, channels):
+		'''Concatenates the rows a to b of the (times, values, a, b) pieces.'''
+		times = [t[a:b] for t, v, a, b in pieces]
+		values = [v[a:b] if channels is None else v[a:b, channels] for t, v, a, b in pieces]
+		if not times:
+			dtype, width = self.streams[stream]
+			ncols = width if channels is None else len(np.arange(width)[channels])
+			return np.empty(0, np.int64), np.empty((0, ncols), dtype)
+		if len(times) == 1:
+			return times[0], values[0]
+		return np.concatenate(times), np.concatenate(values)
+
+
+class Intervals(object):
+	'''
+	Intervals sorted by start. Overlap queries are two binary searches, on
+	the starts and on the running maximum of the ends, plus a scan of the
+	candidates between them.
+	'''
+	def __init__(self, starts, ends, values):
+		order = np.argsort(starts, kind='stable')
+		self.starts = np.asarray(starts, np.int64)[order]
+		self.ends = np.asarray(ends, np.int64)[order]
+		self.values = np.asarray(values)[order]
+		self.max_end = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+	def __len__(self):
+		return len(self.starts)
+
+	def overlapping(self, start=None, end=None):
+		'''Positions of the intervals overlapping start <= t < end.'''
+		j = len(self.starts) if end is None else np.searchsorted(self.starts, end, 'left')
+		if start is None:
+			return np.arange(j)
+		i = np.searchsorted(self.max_end[:j], start, 'right')
+		return i + np.flatnonzero(self.ends[i:j] > start)
+
+
+class EventIndex(object):
+	'''
+	Pose, arm and label intervals of a recording.
+
+	Intervals are half open, start <= t < end, like Recording.read. A pose
+	lasts from its event to the next pose event, or to one nanosecond past
+	the last sample of the recording, and likewise the arm sync state.
+	Labels are intervals added with add_label and kept in the sidecar index
+	by Recording.save_index. Values are Pose and Arm members or label names.
+
+		for start, end in zip(*r.events.segments('pose', Pose.FIST)):
+			...
+	'''
+	TYPES = {'pose': Pose, 'arm': Arm}
+
+	def __init__(self):
+		self.kinds = {}
+		self.by_value = {}
+
+	@classmethod
+	def from_recording(cls, r):
+		ev = cls()
+		# The last intervals hold the last sample too
+		end = r.end + 1 if r.end is not None else None
+		for kind in ('pose', 'arm'):
+			if kind in r.streams:
+				t, v = r.read(kind)
+				ev.set(kind, *cls.changes(t, v[:, 0], end))
+		ev.set('label', *r.labels)
+		return ev
+
+	@staticmethod
+	def changes(times, values, end):
+		'''Intervals over which values hold, from events at times.'''
+		keep = np.ones(len(values), bool)
+		keep[1:] = values[1:] != values[:-1]
+		starts = times[keep]
+		ends = np.append(starts[1:], end if end is not None else starts[-1:] + 1)
+		return starts, ends[:len(starts)], values[keep]
+
+	def set(self, kind, starts, ends, values):
+		self.kinds[kind] = Intervals(starts, ends, values)
+		values = self.kinds[kind].values
+		for v in np.unique(values):
+			mask = values == v
+			self.by_value[kind, v.item()] = Intervals(self.kinds[kind].starts[mask], self.kinds[kind].ends[mask], values[mask])
+
+	def key(self, value):
+		return value.value if isinstance(value, (Pose, Arm)) else value
+
+	def value(self, kind, v):
+		v = v.item()
+		return self.TYPES[kind](v) if kind in self.TYPES else v
+
+	def segments(self, kind, value, start=None, end=None):
+		'''(starts, ends) of the kind intervals with value, clipped to start <= t < end.'''
+		iv = self.by_value.get((kind, self.key(value)))
+		if iv is None:
+			return np.empty(0, np.int64), np.empty(0, np.int64)
+		k = iv.overlapping(start, end)
+		starts = iv.starts[k] if start is None else np.maximum(iv.starts[k], start)
+		ends = iv.ends[k] if end is None else np.minimum(iv.ends[k], end)
+		return starts, ends
+
+	def overlapping(self, kind, start=None, end=None):
+		'''The (start, end, value) kind intervals overlapping start <= t < end.'''
+		iv = self.kinds.get(kind)
+		if iv is None:
+			return []
+		return [(iv.starts[k].item(), iv.ends[k].item(), self.value(kind, iv.values[k])) for k in iv.overlapping(start, end)]
+
+	def at(self, kind, t):
+		'''Values of the kind intervals holding at time t.'''
+		return [v for _, _, v in self.overlapping(kind, t, t + 1)]
+
+	def add_label(self, start, end, name):
+		starts, ends, names = self.labels()
+		self.set('label', np.append(starts, start), np.append(ends, end), np.append(names, name))
+
+	def labels(self):
+		iv = self.kinds.get('label')
+		if iv is None or not len(iv):
+			return EMPTY_LABELS
+		return iv.starts, iv.ends, iv.values.astype(str)
+
+
+class StreamBuffer(object):
+	'''
+	Preallocated blocks of one stream. The acquisition thread fills the
+	active block and queues it once full, the flush thread writes queued
+	blocks and returns them to the free pool. lock guards the active block of
+	the event streams, which the flush thread also hands over.
+	'''
+	def __init__(self, name, dtype, width, size, blocks):
+		self.name = name
+		self.size = size
+		self.free = collections.deque((np.zeros(size, np.int64), np.zeros((size, width), dtype)) for _ in range(blocks))
+		self.times, self.values = self.free.popleft()
+		self.n = 0
+		self.dropped = 0
+		self.lock = threading.Lock()
+		# time.monotonic_ns() when the first sample of the active block was added
+		self.since = None
+
+
+class Recorder(object):
+	'''
+	Records a Myo to a recording with fixed memory.
+
+	Samples are copied into blocks of size samples per stream, blocks of them
+	in total, and a background thread writes each full block as one chunk,
+	calling fsync every fsync seconds. The handlers never wait on the disk: if
+	it falls so far behind that no block is free, samples are dropped and
+	counted in dropped. A partially filled block is also handed over once it
+	spans flush_interval seconds, and the flush thread hands over those of the
+	pose, arm and battery events once they are flush_interval seconds old, so
+	a crash loses at most about that much.
+	codec and level choose the chunk compression, see RecordingWriter.
+	With pyramid, close() builds the EMG and IMU decimation pyramids from the
+	finished recording and saves them next to it, so Recording.view() has
+	nothing to compute. Nothing of them is kept while recording.
+
+	Attach after Myo.connect, the header records its firmware and address.
+
+		m.connect()
+		with Recorder('session.myo', m):
+			while True:
+				m.run()
+	'''
+	def __init__(self, path, myo, size=4096, blocks=2, fsync=1.0, flush_interval=5.0, meta=None, codec=RAW, level=None,
+			pyramid=False):
+		self.myo = myo
+		self.path = path
+		self.writer = RecordingWriter.for_myo(path, myo, meta, codec=codec, level=level)
+		self.pyramid = pyramid
+		self.buffers = {name: StreamBuffer(name, self.writer.dtypes[name], width, size, blocks)
+			for name, (dtype, width) in self.writer.streams.items()}
+		# Streams of events, too sparse to fill a block in flush_interval
+		self.events = [self.buffers[name] for name in ('pose', 'arm', 'battery') if name in self.buffers]
+		self.fsync = fsync
+		self.flush_interval = int(flush_interval * 1e9)
+		self.cond = threading.Condition()
+		self.queue = collections.deque()
+		self.error = None
+		self.recording = True
+
+		self.thread = threading.Thread(target=self.write_blocks, daemon=True)
+		self.thread.start()
+
+		# The EMG batches are copied block by block, the rest sample by sample
+		self.batcher = myo.add_emg_batch_handler(self.on_emg, size=min(size, 50))
+		# (list, handler) of every handler added to the Myo, removed by close()
+		self.handlers = [
+			(myo.imu_handlers, self.on_imu),
+			(myo.pose_handlers, self.on_pose),
+			(myo.arm_handlers, self.on_arm),
+			(myo.battery_handlers, self.on_battery),
+		]
+		for handlers, h in self.handlers:
+			handlers.append(h)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	@property
+	def dropped(self):
+		return {name: b.dropped for name, b in self.buffers.items()}
+
+	# Acquisition side
+	def on_emg(self, emg, times):
+		if self.recording:
+			self.add_block(self.buffers['emg'], times, emg)
+
+	def on_imu(self, quat, acc, gyro):
+		if self.recording:
+			self.add(self.buffers['imu'], self.myo.imu_time, quat + acc + gyro)
+
+	def on_pose(self, p):
+		if self.recording:
+			self.add_event(self.buffers['pose'], self.myo.packet_time, p.value)
+
+	def on_arm(self, arm, xdir):
+		if self.recording:
+			self.add_event(self.buffers['arm'], self.myo.packet_time, (arm.value, xdir.value))
+
+	def on_battery(self, battery):
+		if self.recording:
+			self.add_event(self.buffers['battery'], self.myo.packet_time, battery)
+
+	def add_event(self, b, t, row):
+		with b.lock:
+			if b.n == 0:
+				b.since = time.monotonic_ns()
+			self.add(b, t, row)
+
+	def add(self, b, t, row):
+		if b.values is None and not self.swap(b):
+			b.dropped += 1
+			return
+		n = b.n
+		b.times[n] = t
+		b.values[n] = row
+		b.n = n + 1
+		if b.n == b.size or t - b.times[0] >= self.flush_interval:
+			self.hand_over(b)
+
+	def add_block(self, b, times, values):
+		i = 0
+		k = len(times)
+		while i < k:
+			if b.values is None and not self.swap(b):
+				b.dropped += k - i
+				return
+			m = min(k - i, b.size - b.n)
+			b.times[b.n:b.n + m] = times[i:i + m]
+			b.values[b.n:b.n + m] = values[i:i + m]
+			b.n += m
+			i += m
+			if b.n == b.size or b.times[b.n - 1] - b.times[0] >= self.flush_interval:
+				self.hand_over(b)
+
+	def hand_over(self, b):
+		'''Queues the active block of b for writing and takes a free one.'''
+		with self.cond:
+			self.queue.append((b, b.times, b.values, b.n))
+			self.cond.notify()
+		b.times = b.values = None
+		b.n = 0
+		self.swap(b)
+
+	def swap(self, b):
+		# deque appends and pops are atomic, no need for the lock
+		try:
+			b.times, b.values = b.free.popleft()
+		except IndexError:
+			return False
+		return True
+
+	# Disk side
+	def hand_over_events(self):
+		'''Hands over the event blocks holding an event flush_interval old.'''
+		now = time.monotonic_ns()
+		for b in self.events:
+			with b.lock:
+				if b.n and now - b.since >= self.flush_interval:
+					self.hand_over(b)
+
+	def write_blocks(self):
+		last_sync = time.monotonic()
+		wait = min(self.fsync, self.flush_interval / 1e9)
+		while True:
+			self.hand_over_events()
+			with self.cond:
+				if not self.queue and self.recording:
+					self.cond.wait(wait)
+				if not self.queue and not self.recording:
+					return
+				items = list(self.queue)
+				self.queue.clear()
+
+			for b, times, values, n in items:
+				try:
+					self.writer.write(b.name, times[:n], values[:n])
+				except Exception as e:
+					# Keep recycling blocks so the acquisition goes on, report on close
+					self.error = e
+				b.free.append((times, values))
+
+			if time.monotonic() - last_sync >= self.fsync:
+				try:
+					self.writer.flush()
+					os.fsync(self.writer.f.fileno())
+				except Exception as e:
+					self.error = e
+				last_sync = time.monotonic()
+
+	def close(self):
+		'''Writes the partially filled blocks and closes the recording.'''
+		if not self.recording:
+			return
+		self.myo.flush_emg_batches()
+		if self.batcher in self.myo.emg_batchers:
+			self.myo.emg_batchers.remove(self.batcher)
+		for handlers, h in self.handlers:
+			if h in handlers:
+				handlers.remove(h)
+		for b in self.buffers.values():
+			with b.lock:
+				if b.n:
+					with self.cond:
+						self.queue.append((b, b.times, b.values, b.n))
+					b.times = b.values = None
+					b.n = 0
+		with self.cond:
+			self.recording = False
+			self.cond.notify()
+		self.thread.join()
+		self.writer.flush()
+		os.fsync(self.writer.f.fileno())
+		self.writer.close()
+		if self.error is not None:
+			raise self.error
+		if self.pyramid:
+			# Built chunk by chunk from the file, and saved, by Recording.pyramid
+			with Recording(self.path) as r:
+				for name in ('emg', 'imu'):
+					if name in r.streams:
+						r.pyramid(name)
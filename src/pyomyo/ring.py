@@ -0,0 +1,170 @@
+'''
+Shared memory transport between a Myo worker process and its consumers.
+
+A SharedRing is a fixed capacity ring of frames in a
+multiprocessing.shared_memory block, written by a single producer and read by
+any number of consumers without pickling. Every frame is written twice, at
+i and i + capacity, so any window of up to capacity frames is a contiguous
+slice and readers get it as a NumPy view without copying.
+
+The producer never takes a lock to write, the condition is only used to wake
+up readers blocked in wait().
+
+	rings = MyoRings(mode=emg_mode.FILTERED)
+	p = multiprocessing.Process(target=worker, args=(rings,))
+	p.start()
+
+	seq = 0
+	while True:
+		seq = rings.emg.wait(seq)
+		times, emg = rings.emg.latest(100)
+'''
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pyomyo.pyomyo import emg_mode
+
+class SharedRing(object):
+	'''
+	Single producer ring of capacity frames of width values with an int64
+	time.monotonic_ns() sampling time each.
+
+	The ring is created in the parent process and passed to the worker
+	process as a Process argument, the shared memory is attached again on
+	the other side. A view of n frames returned by latest() or read() stays
+	valid while the producer writes capacity - n more frames, its oldest
+	frame is overwritten by the next one: a view of capacity frames goes
+	stale on the very next write. Copy with .copy() whatever is kept longer.
+	'''
+	def __init__(self, capacity, width, dtype=np.int16, name=None):
+		self.capacity = capacity
+		self.width = width
+		self.dtype = np.dtype(dtype)
+		self.cond = multiprocessing.Condition()
+
+		size = 8 + 2 * capacity * (8 + width * self.dtype.itemsize)
+		self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+		self.owner = True
+		self.map()
+		self.header[0] = 0
+
+	def map(self):
+		cap = 2 * self.capacity
+		buf = self.shm.buf
+		# header[0] is the number of frames ever written
+		self.header = np.ndarray((1,), dtype=np.int64, buffer=buf)
+		self.times = np.ndarray((cap,), dtype=np.int64, buffer=buf, offset=8)
+		self.data = np.ndarray((cap, self.width), dtype=self.dtype, buffer=buf, offset=8 + 8 * cap)
+
+	def __getstate__(self):
+		return (self.shm.name, self.capacity, self.width, self.dtype.str, self.cond)
+
+	def __setstate__(self, state):
+		name, self.capacity, self.width, dtype, self.cond = state
+		self.dtype = np.dtype(dtype)
+		self.shm = shared_memory.SharedMemory(name=name)
+		self.owner = False
+		self.map()
+
+	@property
+	def seq(self):
+		return int(self.header[0])
+
+	# Producer side
+	def write(self, frame, t):
+		seq = int(self.header[0])
+		i = seq % self.capacity
+		self.data[i] = frame
+		self.data[i + self.capacity] = frame
+		self.times[i] = t
+		self.times[i + self.capacity] = t
+		# Publish the frame only once it is fully written
+		self.header[0] = seq + 1
+		self.notify()
+
+	def write_block(self, frames, times):
+		'''
+		Writes a block of frames at once, waking readers only once. Of a block
+		longer than capacity only the last capacity frames are kept, the others
+		still count in the sequence number, as frames overwritten before being
+		read.
+		'''
+		seq = int(self.header[0])
+		if len(frames) > self.capacity:
+			seq += len(frames) - self.capacity
+			frames = frames[-self.capacity:]
+			times = times[-self.capacity:]
+		idx = (seq + np.arange(len(frames))) % self.capacity
+		self.data[idx] = frames
+		self.data[idx + self.capacity] = frames
+		self.times[idx] = times
+		self.times[idx + self.capacity] = times
+		self.header[0] = seq + len(frames)
+		self.notify()
+
+	def notify(self):
+		with self.cond:
+			self.cond.notify_all()
+
+	# Consumer side
+	def latest(self, n):
+		'''Returns (times, frames) views of the last n frames written.'''
+		seq = int(self.header[0])
+		n = min(n, seq, self.capacity)
+		start = (seq - n) % self.capacity
+		return self.times[start:start + n], self.data[start:start + n]
+
+	def read(self, seq):
+		'''
+		Returns (times, frames, seq) with views of the frames written after
+		sequence number seq and the new sequence number to pass next time.
+		Frames that were overwritten before being read are skipped, the
+		number lost is seq - old_seq - len(frames).
+		'''
+		head = int(self.header[0])
+		n = min(head - seq, self.capacity)
+		start = (head - n) % self.capacity
+		return self.times[start:start + n], self.data[start:start + n], head
+
+	def wait(self, seq, timeout=None):
+		'''
+		Blocks until frames after sequence number seq are written, or timeout
+		seconds pass, and returns the current sequence number.
+		'''
+		with self.cond:
+			self.cond.wait_for(lambda: self.header[0] > seq, timeout)
+		return int(self.header[0])
+
+	def close(self):
+		# Drop the views before releasing the buffer they point into
+		self.header = self.times = self.data = None
+		self.shm.close()
+		if self.owner:
+			self.shm.unlink()
+
+
+class MyoRings(object):
+	'''
+	An EMG ring (8 values per frame) and an IMU ring (quat, acc and gyro, 10
+	values per frame) fed by a Myo in a worker process with attach().
+	'''
+	def __init__(self, mode=emg_mode.PREPROCESSED, capacity=4096):
+		dtype = np.uint16 if emg_mode(mode) == emg_mode.PREPROCESSED else np.int8
+		self.emg = SharedRing(capacity, 8, dtype)
+		self.imu = SharedRing(capacity, 10, np.int16)
+
+	def attach(self, m, batch=10, latency=0.05):
+		'''Adds handlers to the Myo m that write its data into the rings.'''
+		self.myo = m
+		m.add_emg_batch_handler(self.emg.write_block, size=batch, latency=latency)
+		m.add_imu_handler(self.proc_imu)
+
+	def proc_imu(self, quat, acc, gyro):
+		self.imu.write(quat + acc + gyro, self.myo.imu_time)
+
+	def close(self):
+		self.emg.close()
+		self.imu.close()
@@ -0,0 +1,260 @@
+'''
+Labelled training samples for the classifiers.
+
+A TrainingStore keeps the samples of each label in its own memory-mapped
+segment file, root/vals<i>.dat for the label at index i, and one header,
+root/store.hdr, holding the sample type and, for each label, its name, the
+number of samples and the capacity of its segment. The header is memory
+mapped as well, so opening a store reads no samples, counts come straight
+from the header, and appending a sample writes it in place, growing only the
+segment of its label, by doubling, when it is full.
+
+flush(), close() and clear() cut every segment file back to its samples, as
+does opening the store, so outside of a running store there is a vals<i>.dat
+for every label, holding exactly the raw samples of its label, nothing more, and the tools and
+notebooks reading them with np.fromfile keep working.
+
+	store = TrainingStore('data', ['rest', 'fist', 'open'])
+	store.append('fist', emg)
+	store.count('fist')
+	X, Y = store.arrays()
+
+The data/vals0.dat ... vals9.dat files of earlier versions hold the same raw
+samples, so they are taken as the segments of the first labels when a store
+is created in their directory.
+'''
+
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'PYOMYOTS'
+# Magic, sample width, number of labels, sample dtype
+PREAMBLE = struct.Struct('<8sII8s')
+ENTRY = np.dtype([('name', 'S32'), ('count', '<i8'), ('capacity', '<i8')])
+HEADER = 'store.hdr'
+# Smallest segment allocated, in samples
+MIN_CAPACITY = 1024
+
+class TrainingStore(object):
+	'''
+	Samples of width values of type dtype, under labels by name.
+
+	Labels are given by name or by index, in the order they were added. The
+	arrays returned by samples() are views of the segment files and stay
+	valid until the store is flushed, cleared or closed.
+	'''
+	def __init__(self, root='data', labels=None, width=8, dtype=np.uint16):
+		self.root = root
+		self.path = os.path.join(root, HEADER)
+		os.makedirs(root, exist_ok=True)
+		if os.path.exists(self.path):
+			self.map_header()
+			if self.width != width or self.dtype != np.dtype(dtype):
+				raise ValueError('%s holds %d x %s samples, not %d x %s' %
+					(self.path, self.width, self.dtype, width, np.dtype(dtype)))
+		else:
+			self.create(width, dtype)
+		self.segments = [None] * len(self.entries)
+		# Drops any capacity left by a store that was not closed
+		for i in range(len(self.labels)):
+			self.trim(i)
+		for label in labels or []:
+			if label not in self.labels:
+				self.add_label(label)
+
+	def create(self, width, dtype):
+		dtype = np.dtype(dtype)
+		with open(self.path + '.tmp', 'wb') as f:
+			f.write(PREAMBLE.pack(MAGIC, width, 0, dtype.str.encode()))
+		os.replace(self.path + '.tmp', self.path)
+		self.map_header()
+
+	def map_header(self):
+		with open(self.path, 'rb') as f:
+			magic, self.width, n, dtype = PREAMBLE.unpack(f.read(PREAMBLE.size))
+		if magic != MAGIC:
+			raise ValueError('%s is not a training store' % self.path)
+		self.dtype = np.dtype(dtype.rstrip(b'\0').decode())
+		self.row = self.width * self.dtype.itemsize
+		if n:
+			self.entries = np.memmap(self.path, ENTRY, 'r+', PREAMBLE.size, (n,))
+		else:
+			self.entries = np.zeros(0, ENTRY)
+		self.labels = [e.decode() for e in self.entries['name']]
+
+	def segment_path(self, i):
+		return os.path.join(self.root, 'vals%d.dat' % i)
+
+	def add_label(self, name):
+		'''Adds the label name, returns its index.'''
+		if name in self.labels:
+			raise ValueError('Label %s exists' % name)
+		i = len(self.labels)
+		entry = np.zeros(1, ENTRY)
+		entry['name'] = str(name).encode()
+		# Samples left by earlier versions become the segment of the label
+		seg = self.segment_path(i)
+		if os.path.exists(seg):
+			entry['count'] = entry['capacity'] = os.path.getsize(seg) // self.row
+		else:
+			# Readers expect a file for every label, even without samples
+			open(seg, 'wb').close()
+
+		self.flush()
+		self.entries = None
+		with open(self.path, 'r+b') as f:
+			f.seek(0, os.SEEK_END)
+			f.write(entry.tobytes())
+			f.seek(0)
+			f.write(PREAMBLE.pack(MAGIC, self.width, i + 1, self.dtype.str.encode()))
+		self.map_header()
+		self.segments.append(None)
+		return i
+
+	def index(self, label):
+		'''Index of label, given by name or index.'''
+		if isinstance(label, (int, np.integer)):
+			if not 0 <= label < len(self.labels):
+				raise IndexError('No label %d' % label)
+			return int(label)
+		return self.labels.index(str(label))
+
+	def count(self, label):
+		return int(self.entries['count'][self.index(label)])
+
+	@property
+	def counts(self):
+		'''Number of samples of every label.'''
+		return self.entries['count']
+
+	def __len__(self):
+		return int(self.entries['count'].sum())
+
+	def segment(self, i):
+		'''The mapped segment of label i, all of its capacity.'''
+		if self.segments[i] is None:
+			capacity = int(self.entries['capacity'][i])
+			if capacity == 0:
+				return np.empty((0, self.width), self.dtype)
+			self.segments[i] = np.memmap(self.segment_path(i), self.dtype, 'r+', shape=(capacity, self.width))
+		return self.segments[i]
+
+	def grow(self, i, n):
+		'''Makes room for n samples of label i.'''
+		capacity = max(2 * int(self.entries['capacity'][i]), MIN_CAPACITY)
+		while capacity < n:
+			capacity *= 2
+		if self.segments[i] is not None:
+			self.segments[i].flush()
+			self.segments[i] = None
+		with open(self.segment_path(i), 'ab') as f:
+			f.truncate(capacity * self.row)
+		self.entries['capacity'][i] = capacity
+
+	def trim(self, i):
+		'''
+		Cuts the segment file of label i to its samples, creating it empty if
+		it is missing. The count is lowered to what the file holds if it was
+		cut by something else.
+		'''
+		if self.segments[i] is not None:
+			self.segments[i].flush()
+			self.segments[i] = None
+		path = self.segment_path(i)
+		size = os.path.getsize(path) if os.path.exists(path) else 0
+		count = min(int(self.entries['count'][i]), size // self.row)
+		if size != count * self.row or not os.path.exists(path):
+			with open(path, 'ab') as f:
+				f.truncate(count * self.row)
+		self.entries['count'][i] = count
+		self.entries['capacity'][i] = count
+
+	def append(self, label, values):
+		'''Appends one sample, or a 2D array of them, under label.'''
+		i = self.index(label)
+		values = np.asarray(values, self.dtype).reshape(-1, self.width)
+		count = int(self.entries['count'][i])
+		n = count + len(values)
+		if n > self.entries['capacity'][i]:
+			self.grow(i, n)
+		self.segment(i)[count:n] = values
+		# Counted once written, so a crash never counts unwritten samples
+		self.entries['count'][i] = n
+
+	def samples(self, label):
+		'''The samples of label, a view of its segment.'''
+		i = self.index(label)
+		return self.segment(i)[:self.entries['count'][i]]
+
+	def arrays(self):
+		'''
+		(X, Y), the samples of every label one after the other and the index
+		of the label of each.
+		'''
+		counts = self.counts
+		X = np.empty((int(counts.sum()), self.width), self.dtype)
+		start = 0
+		for i, n in enumerate(counts):
+			X[start:start + n] = self.samples(i)
+			start += n
+		return X, np.repeat(np.arange(len(counts)), counts)
+
+	def clear(self, label=None):
+		'''Deletes the samples of label, or of every label, emptying their files.'''
+		for i in range(len(self.labels)) if label is None else [self.index(label)]:
+			self.entries['count'][i] = 0
+			self.trim(i)
+		self.flush()
+
+	def flush(self):
+		'''Writes the samples and the header out, cutting the segments to their samples.'''
+		for i in range(len(self.segments)):
+			self.trim(i)
+		if isinstance(self.entries, np.memmap):
+			self.entries.flush()
+
+	def close(self):
+		self.flush()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+class SampleBuffer(object):
+	'''
+	Growable in memory copy of the samples of a store, the (X, Y) the
+	classifiers train on. Appending doubles the capacity when it is full, X
+	and Y are views of the first n rows.
+	'''
+	def __init__(self, X, Y):
+		self.n = len(X)
+		capacity = max(2 * self.n, MIN_CAPACITY)
+		self.x = np.empty((capacity,) + X.shape[1:], X.dtype)
+		self.y = np.empty(capacity, Y.dtype)
+		self.x[:self.n] = X
+		self.y[:self.n] = Y
+
+	@property
+	def X(self):
+		return self.x[:self.n]
+
+	@property
+	def Y(self):
+		return self.y[:self.n]
+
+	def append(self, values, y):
+		values = np.asarray(values, self.x.dtype).reshape((-1,) + self.x.shape[1:])
+		n = self.n + len(values)
+		if n > len(self.x):
+			capacity = max(2 * len(self.x), n)
+			self.x = np.concatenate((self.x[:self.n], np.empty((capacity - self.n,) + self.x.shape[1:], self.x.dtype)))
+			self.y = np.concatenate((self.y[:self.n], np.empty(capacity - self.n, self.y.dtype)))
+		self.x[self.n:n] = values
+		self.y[self.n:n] = y
+		self.n = n
+		return self.X, self.Y
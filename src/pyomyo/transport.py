@@ -0,0 +1,158 @@
+'''
+Transports for BT other than a plain serial port.
+
+RecordingTransport captures everything read from and written to the dongle,
+with the arrival time of every read, and ReplayTransport feeds a capture back
+into BT/Myo at real-time speed, N times faster, or as fast as possible. With
+them the whole parse, handler and classifier path can be profiled and tested
+offline.
+
+	bt = BT(transport=RecordingTransport('session.cap', tty))
+	m = Myo(bt=bt)
+	m.connect()
+	...
+
+	m = Myo(bt=BT(transport=ReplayTransport('session.cap', speed=None)))
+	m.connect()
+	while True:
+		m.run() # raises EOFError at the end of the capture
+
+A capture file is the magic bytes below followed by records of a '<qBI'
+header, the time.monotonic_ns() time, the direction (RX or TX) and the data
+length, and the data itself.
+'''
+
+import struct
+import time
+
+from pyomyo.pyomyo import open_serial
+
+MAGIC = b'PYOMYOCAP1'
+RECORD = struct.Struct('<qBI')
+RX = 0
+TX = 1
+
+class RecordingTransport(object):
+	'''
+	Serial port transport that writes every read and write to a capture file.
+	port is a tty or an already open transport to wrap.
+	'''
+	def __init__(self, path, port=None):
+		self.port = port if port is not None and not isinstance(port, str) else open_serial(port)
+		self.f = open(path, 'wb')
+		self.f.write(MAGIC)
+		self.last = time.monotonic_ns()
+
+	@property
+	def in_waiting(self):
+		return self.port.in_waiting
+
+	@property
+	def timeout(self):
+		return self.port.timeout
+
+	@timeout.setter
+	def timeout(self, timeout):
+		self.port.timeout = timeout
+
+	def clock(self):
+		return self.last
+
+	def read(self, n=1):
+		data = self.port.read(n)
+		self.last = time.monotonic_ns()
+		if data:
+			self.f.write(RECORD.pack(self.last, RX, len(data)))
+			self.f.write(data)
+		return data
+
+	def write(self, data):
+		self.f.write(RECORD.pack(time.monotonic_ns(), TX, len(data)))
+		self.f.write(data)
+		return self.port.write(data)
+
+	def close(self):
+		self.port.close()
+		self.f.close()
+
+
+def read_capture(path):
+	'''Yields the (t, direction, data) records of a capture file.'''
+	with open(path, 'rb') as f:
+		if f.read(len(MAGIC)) != MAGIC:
+			raise ValueError('%s is not a pyomyo capture' % path)
+		while True:
+			header = f.read(RECORD.size)
+			if len(header) < RECORD.size:
+				return
+			t, direction, n = RECORD.unpack(header)
+			yield t, direction, f.read(n)
+
+
+class ReplayTransport(object):
+	'''
+	Plays back the bytes read in a capture, chunked as they were read.
+
+	speed is the playback rate relative to real time, None replays as fast as
+	possible. Writes are discarded, the recorded responses to them are in the
+	capture already. clock() gives the recorded arrival times shifted to the
+	start of the replay, so sample times keep the recorded spacing at any
+	speed. Reads raise EOFError once the capture is exhausted.
+	'''
+	def __init__(self, path, speed=1.0):
+		self.speed = speed
+		self.timeout = None
+		self.records = [(t, data) for t, direction, data in read_capture(path) if direction == RX]
+		self.i = 0
+		self.chunk = b''
+		self.pos = 0
+		self.start = time.monotonic_ns()
+		self.t0 = self.records[0][0] if self.records else 0
+		self.last = self.start
+
+	def clock(self):
+		return self.last
+
+	def due(self, t):
+		'''Seconds until the record stamped t is due, 0 if it already is.'''
+		if self.speed is None:
+			return 0
+		wall = self.start + (t - self.t0) / self.speed
+		return max(0.0, (wall - time.monotonic_ns()) / 1e9)
+
+	def next_chunk(self):
+		if self.i >= len(self.records):
+			raise EOFError('end of capture')
+		t, data = self.records[self.i]
+		wait = self.due(t)
+		if wait and self.timeout is not None and wait > self.timeout:
+			time.sleep(self.timeout)
+			return False
+		if wait:
+			time.sleep(wait)
+		self.i += 1
+		self.chunk = data
+		self.pos = 0
+		self.last = self.start + (t - self.t0)
+		return True
+
+	@property
+	def in_waiting(self):
+		n = len(self.chunk) - self.pos
+		if n == 0 and self.i < len(self.records) and not self.due(self.records[self.i][0]):
+			n = len(self.records[self.i][1])
+		return n
+
+	def read(self, n=1):
+		if self.pos >= len(self.chunk):
+			if not self.next_chunk():
+				return b''
+		data = self.chunk[self.pos:self.pos + n]
+		self.pos += len(data)
+		return data
+
+	def write(self, data):
+		return len(data)
+
+	def close(self):
+		self.records = []